@@ -0,0 +1,780 @@
+'''
+Throughput benchmarks for the python MazeBase engine.
+
+    python benchmark.py            # runs every benchmark
+    python benchmark.py vec        # runs only the named benchmarks
+'''
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from collections import OrderedDict, defaultdict
+from itertools import product
+from random import choice, randrange
+import copy
+import sys
+import time
+import numpy as np
+
+import mazebase.games as games
+from mazebase.games import featurizers
+import mazebase.items as mi
+from mazebase.items import agents
+from mazebase.utils import creationutils, encoding, tilemap
+
+import logging
+logging.getLogger().setLevel(logging.CRITICAL)
+
+BENCHMARKS = OrderedDict()
+
+
+def benchmark(func):
+    BENCHMARKS[func.__name__[len('bench_'):]] = func
+    return func
+
+
+def rate(func, n, min_time=1.0):
+    '''Calls func(n) until min_time seconds passed, returns calls/sec'''
+    done, start = 0, time.time()
+    while True:
+        func(n)
+        done += n
+        elapsed = time.time() - start
+        if elapsed >= min_time:
+            return done / elapsed
+
+
+def report(name, value, unit):
+    print("  {0:<40} {1:>12.1f} {2}".format(name, value, unit))
+
+
+class Sprinkled(games.WithWaterAndBlocksMixin):
+    '''Blocks, water and a wandering agent, no reward estimation. Cheap to
+    reset on any map size, so it measures the map storage itself.'''
+
+    class Agent(agents.SingleTileMovable, agents.Pushing):
+        pass
+
+    def _reset(self):
+        super(Sprinkled, self)._reset()
+        loc = creationutils.random_empty_location(self)
+        self.agent = self.Agent(location=loc)
+        self._add_agent(self.agent, "SprinkledAgent")
+
+    def _finished(self):
+        return False
+
+    def _get_reward(self, id):
+        return super(Sprinkled, self)._get_reward(id)
+
+
+def reference_dijkstra(game, initial, movefunc, weighted=False):
+    '''The original O(V^2) creationutils.dijkstra, kept to compare against'''
+    visited = defaultdict(lambda: 1e309)
+    visited[initial] = 0
+    path = {}
+
+    nodes = set(product(range(game.width), range(game.height)))
+    while nodes:
+        current = nodes.intersection(visited.keys())
+        if not current:
+            break
+        min_node = min(current, key=visited.get)
+        nodes.remove(min_node)
+        current_weight = visited[min_node]
+
+        for edge in movefunc(game, min_node):
+            w = -game._approx_reward_map[edge[0]][edge[1]] if weighted else 1
+            weight = current_weight + w
+            if edge not in visited or weight < visited[edge]:
+                visited[edge] = weight
+                path[edge] = min_node
+
+    return visited, path
+
+
+@benchmark
+def bench_vec():
+    '''VecMazeGame.step against the per game observe() / act() loop'''
+    nactions = len(games.SingleGoal.all_possible_actions())
+    for featurizer in [featurizers.SentenceFeaturesRelative(bounds=5),
+                       featurizers.GridFeaturizer()]:
+        print(type(featurizer).__name__)
+        for batch in [16, 128]:
+            envs = [games.SingleGoal(featurizer=featurizer)
+                    for _ in range(batch)]
+
+            def loop(n):
+                for _ in range(n // batch):
+                    for game in envs:
+                        obs = game.observe()['observation']
+                        if isinstance(featurizer,
+                                      featurizers.BaseGridFeaturizer):
+                            featurizers.grid_one_hot(game, obs[0], np)
+                            featurizers.vocabify(game, obs[1], np)
+                        else:
+                            featurizers.vocabify(game, obs, np)
+                        actions = game.all_possible_actions()
+                        game.act(actions[randrange(len(actions))])
+                        if game.is_over():
+                            game.reset()
+
+            vec = games.VecMazeGame(envs)
+            vec.reset()
+
+            def stepped(n):
+                for _ in range(n // batch):
+                    vec.step(np.random.randint(nactions, size=batch))
+
+            report("loop, batch {0}".format(batch),
+                   rate(loop, batch), "steps/s")
+            report("VecMazeGame, batch {0}".format(batch),
+                   rate(stepped, batch), "steps/s")
+
+
+@benchmark
+def bench_map():
+    '''Map storage: reset, moving, placement queries and grid featurizing'''
+    for size in [10, 64]:
+        game = Sprinkled(map_size=(size, size, size, size),
+                         featurizer=featurizers.GridFeaturizer())
+        actions = game.actions()
+
+        def reset(n):
+            for _ in range(n):
+                game.reset()
+
+        def step(n):
+            for _ in range(n):
+                game.act(actions[randrange(len(actions))])
+
+        def empties(n):
+            for _ in range(n):
+                creationutils.empty_locations(game, bad_blocks=[mi.Block])
+
+        def featurize(n):
+            for _ in range(n):
+                game.observe()
+
+        locs = list(product(range(size), range(size)))
+
+        def movefunc(n):
+            for loc in locs[:n]:
+                creationutils.agent_movefunc(game, loc)
+
+        print("{0}x{0}".format(size))
+        report("reset", rate(reset, 10), "resets/s")
+        report("act", rate(step, 100), "steps/s")
+        report("empty_locations", rate(empties, 10), "calls/s")
+        report("GridFeaturizer observe", rate(featurize, 10), "calls/s")
+        report("agent_movefunc", rate(movefunc, 100), "calls/s")
+
+
+@benchmark
+def bench_paths():
+    '''Shortest paths on maps with 30% blocks, against reference_dijkstra'''
+    for size in [10, 32, 64, 200]:
+        game = Sprinkled(map_size=(size, size, size, size), blockpct=0.3)
+        game._accumulate_approximate_rewards()
+        start = game.agent.location
+        free = creationutils.empty_locations(game, bad_blocks=[mi.Block])
+        target = max(free, key=lambda loc: abs(loc[0] - start[0]) +
+                     abs(loc[1] - start[1]))
+        move = creationutils.agent_movefunc
+
+        if size <= 64:
+            for weighted in [False, True]:
+                ref, _ = reference_dijkstra(game, start, move, weighted)
+                new, _ = creationutils.dijkstra(game, start, move, weighted)
+                assert set(ref) == set(new) and all(
+                    abs(ref[k] - new[k]) < 1e-9 for k in ref)
+                astar, _ = creationutils.astar(game, start, target, move,
+                                               weighted)
+                assert abs(astar[target] - ref[target]) < 1e-9 or \
+                    astar[target] == ref[target]
+
+        print("{0}x{0}".format(size))
+        if size <= 32:
+            report("reference dijkstra",
+                   rate(lambda n: reference_dijkstra(game, start, move), 1),
+                   "calls/s")
+            report("reference dijkstra, weighted",
+                   rate(lambda n: reference_dijkstra(game, start, move, True),
+                        1), "calls/s")
+        report("bfs", rate(lambda n: creationutils.dijkstra(
+            game, start, move), 1), "calls/s")
+        report("heap dijkstra, weighted", rate(lambda n: creationutils.dijkstra(
+            game, start, move, True), 1), "calls/s")
+        report("astar to farthest tile, weighted", rate(
+            lambda n: creationutils.astar(game, start, target, move, True), 1),
+            "calls/s")
+
+
+def start_episodes(game):
+    '''Returns func(n) that resets game and acts once, n times. The first
+    act() is where 'lazy' reward approximation used to happen, so reset()
+    alone would flatter it.'''
+    def start(n):
+        for _ in range(n):
+            game.reset()
+            actions = game.actions()
+            game.act(actions[randrange(len(actions))])
+    return start
+
+
+@benchmark
+def bench_goals():
+    '''Reset and first act throughput as the number of goals grows, with
+    the reward approximation lazy, eager and off'''
+    for cls in [games.Exclusion, games.MultiGoals]:
+        for n_goals, mode in product([3, 6, 10], ['lazy', 'eager', None]):
+            game = cls(n_goals=n_goals, map_size=(32, 32, 32, 32),
+                       approximate_reward=mode)
+            report("{0}, {1} goals, {2}".format(cls.__name__, n_goals, mode),
+                   rate(start_episodes(game), 10), "episodes/s")
+
+
+ALL_GAMES = [games.SingleGoal, games.MultiGoals, games.ConditionedGoals,
+             games.Exclusion, games.Goto, games.GotoHidden, games.PushBlock,
+             games.PushBlockCardinal, games.Switches, games.LightKey,
+             games.BlockedDoor]
+
+
+@benchmark
+def bench_reset():
+    '''Reset and first act throughput with the reward approximation
+    eager, lazy and off'''
+    for cls in ALL_GAMES:
+        for mode in ['eager', 'lazy', None]:
+            game = cls(approximate_reward=mode)
+            report("{0}, {1}".format(cls.__name__, mode),
+                   rate(start_episodes(game), 10), "episodes/s")
+
+
+@benchmark
+def bench_generate():
+    '''Resets and retries per reset as blockpct and the map size grow,
+    with the free space connected by construction and without'''
+    from mazebase.utils.stats import collect_stats
+    for cls in [games.SingleGoal, games.MultiGoals, games.Switches]:
+        print(cls.__name__)
+        for size, blockpct in [(10, 0.1), (10, 0.3), (10, 0.5),
+                               (32, 0.1), (32, 0.3), (32, 0.5)]:
+            for connected in [False, True]:
+                game = cls(map_size=(size, size, size, size),
+                           blockpct=blockpct, connected=connected,
+                           approximate_reward='lazy')
+
+                def reset(n):
+                    for _ in range(n):
+                        game.reset()
+
+                name = "{0}x{0} blockpct {1}, {2}".format(
+                    size, blockpct, "connected" if connected else "rejection")
+                try:
+                    with collect_stats(game) as stats:
+                        resets = rate(reset, 1)
+                except RuntimeError:
+                    report(name, 0, "resets/s, gave up after 100 tries")
+                    continue
+                retries = sum(n for name, n in stats.calls.items()
+                              if name.startswith('reset.retry.'))
+                report(name, resets, "resets/s, {0:.2f} retries/reset".format(
+                    retries / stats.calls['reset']))
+
+
+@benchmark
+def bench_components():
+    '''Reachability checks from the agent, with a search each time and
+    with the game's Components, while blocks come and go'''
+    for size in [10, 32, 64]:
+        game = Sprinkled(map_size=(size, size, size, size), blockpct=0.3,
+                         connected=False)
+        game.reset()
+
+        def check(n, reachable):
+            for i in range(n):
+                loc = creationutils.random_empty_location(
+                    game, bad_blocks=[mi.Block])
+                if i % 2:
+                    block = mi.Block(location=loc)
+                    game._add_item(block)
+                    game._remove_item(block.id)
+                reachable(game.agent.location, loc)
+
+        def search(a, b):
+            visited, _ = creationutils.dijkstra(
+                game, a, creationutils.agent_movefunc)
+            return b in visited
+
+        report("{0}x{0} dijkstra".format(size), rate(
+            lambda n: check(n, search), 20), "checks/s")
+        report("{0}x{0} components".format(size), rate(
+            lambda n: check(n, lambda a, b: game._components().connected(
+                a, b)), 20), "checks/s")
+
+
+@benchmark
+def bench_sprinkle():
+    '''Resets of the blocks and water maps at blockpct 0.3 as they grow,
+    and the share of it spent sprinkling'''
+    for size in [32, 64, 128]:
+        game = Sprinkled(map_size=(size, size, size, size), blockpct=0.3)
+        game.reset()
+
+        def reset(n):
+            for _ in range(n):
+                game.reset()
+
+        def sprinkle(n):
+            for _ in range(n):
+                game._map = tilemap.TileMap(size, size)
+                game._items = {}
+                creationutils.sprinkle(game, [(mi.Block, 0.3),
+                                              (mi.Water, game.waterpct)])
+
+        report("{0}x{0} reset".format(size), rate(reset, 2), "resets/s")
+        report("{0}x{0} sprinkle".format(size), rate(sprinkle, 2),
+               "maps/s")
+        game.reset()
+
+
+@benchmark
+def bench_placement():
+    '''Random empty tiles per second, scanning the map each time and from
+    the free tiles the map keeps up to date, while items come and go'''
+    for size in [10, 32, 100]:
+        game = Sprinkled(map_size=(size, size, size, size))
+        game.reset()
+        tiles = creationutils.empty_locations(game)
+
+        def place(n, sample):
+            for i in range(n):
+                x, y = sample()
+                block = mi.Block(location=(x, y))
+                game._add_item(block)
+                game._remove_item(block.id)
+
+        report("{0}x{0} scan".format(size), rate(lambda n: place(
+            n, lambda: choice(creationutils.empty_locations(game))), 100),
+            "placements/s")
+        report("{0}x{0} free tiles".format(size), rate(lambda n: place(
+            n, lambda: creationutils.random_empty_location(game)), 100),
+            "placements/s")
+        assert len(creationutils.empty_locations(game)) == len(tiles)
+
+
+@benchmark
+def bench_prefetch():
+    '''reset() and first act() latency, plain and with PrefetchingGame,
+    while the acting loop spends 1ms per step outside the GIL (like waiting
+    on a model)'''
+    for cls in [games.LightKey, games.BlockedDoor, games.Exclusion]:
+        for prefetched in [False, True]:
+            game = cls(map_size=(32, 32, 32, 32))
+            if prefetched:
+                game = games.PrefetchingGame(game, prefetch=4)
+            resets, first_acts = [], []
+            for episode in range(30):
+                for _ in range(20):
+                    time.sleep(0.001)
+                    game.act(choice(game.actions()))
+                start = time.time()
+                game.reset()
+                resets.append(time.time() - start)
+                start = time.time()
+                game.act(choice(game.actions()))
+                first_acts.append(time.time() - start)
+            if prefetched:
+                game.close()
+            name = "{0}{1}".format(cls.__name__,
+                                   ", prefetched" if prefetched else "")
+            for what, latencies in [("reset", resets),
+                                    ("first act", first_acts)]:
+                report("{0} {1} mean".format(name, what),
+                       1000 * np.mean(latencies), "ms")
+                report("{0} {1} max".format(name, what),
+                       1000 * np.max(latencies), "ms")
+
+
+@benchmark
+def bench_actions():
+    '''Acting on action strings and on action indices'''
+    game = games.SingleGoal(featurizer=featurizers.GridFeaturizer())
+    names = game.all_possible_actions()
+
+    def listing(n):
+        for _ in range(n):
+            game.actions()
+
+    def by_name(n):
+        for _ in range(n):
+            game.act(names[randrange(len(names))])
+            if game.is_over():
+                game.reset()
+
+    def by_index(n):
+        for _ in range(n):
+            game.act_index(randrange(len(names)))
+            if game.is_over():
+                game.reset()
+
+    report("actions()", rate(listing, 100), "calls/s")
+    report("act", rate(by_name, 100), "steps/s")
+    report("act_index", rate(by_index, 100), "steps/s")
+
+
+@benchmark
+def bench_dense():
+    '''Grid featurizing: strings + grid_one_hot against the dense featurizers
+    writing into a preallocated buffer'''
+    for size in [10, 32, 64]:
+        print("{0}x{0}".format(size))
+        for plain, dense in [
+                (featurizers.GridFeaturizer(),
+                 featurizers.DenseGridFeaturizer()),
+                (featurizers.RelativeGridFeaturizer(bounds=5, notify=True),
+                 featurizers.DenseRelativeGridFeaturizer(bounds=5,
+                                                         notify=True))]:
+            game = Sprinkled(map_size=(size, size, size, size),
+                             featurizer=plain)
+            id = game.current_agent()
+
+            def strings(n):
+                for _ in range(n):
+                    grid, _ = plain.featurize(game, id)
+                    featurizers.grid_one_hot(game, grid, np)
+
+            game._set_featurizer(dense)
+            out = dense.featurize_grid(game, id)
+
+            def planes(n):
+                for _ in range(n):
+                    dense.featurize_grid(game, id, out=out)
+
+            name = type(plain).__name__
+            report(name + " + grid_one_hot", rate(strings, 10), "calls/s")
+            report("Dense" + name, rate(planes, 10), "calls/s")
+
+
+@benchmark
+def bench_ids():
+    '''Featurizing to strings + vocabify against featurizing to token ids'''
+    for cls in [games.SingleGoal, games.LightKey]:
+        print(cls.__name__)
+        for make in [featurizers.SentenceFeaturesRelative,
+                     featurizers.SentenceFeaturesAbsolute]:
+            plain, ids = make(), make(ids=True)
+            game = cls(featurizer=plain)
+            id = game.current_agent()
+
+            def strings(n):
+                for _ in range(n):
+                    featurizers.vocabify(game, plain.featurize(game, id))
+
+            def tokens(n):
+                for _ in range(n):
+                    ids.featurize(game, id)
+
+            name = make.__name__
+            report(name + " + vocabify", rate(strings, 10), "calls/s")
+            report(name + ", ids=True", rate(tokens, 10), "calls/s")
+
+
+@benchmark
+def bench_convert():
+    '''Batched vocabify / grid_one_hot against one call per observation'''
+    batch = 256
+    for featurizer in [featurizers.SentenceFeaturesRelative(bounds=5),
+                       featurizers.GridFeaturizer()]:
+        print(type(featurizer).__name__)
+        envs = [games.SingleGoal(featurizer=featurizer)
+                for _ in range(batch)]
+        games.VecMazeGame(envs)
+        obs = [game.observe()['observation'] for game in envs]
+        grid = isinstance(featurizer, featurizers.BaseGridFeaturizer)
+
+        def single(n):
+            for _ in range(n // batch):
+                for game, o in zip(envs, obs):
+                    if grid:
+                        featurizers.grid_one_hot(game, o[0], np)
+                    else:
+                        featurizers.vocabify(game, o, np)
+
+        def batched(n):
+            for _ in range(n // batch):
+                if grid:
+                    featurizers.grid_one_hot_batch(envs, [o[0] for o in obs])
+                else:
+                    featurizers.vocabify_batch(envs, obs)
+
+        def sparse(n):
+            for _ in range(n // batch):
+                featurizers.grid_one_hot_sparse_batch(envs,
+                                                      [o[0] for o in obs])
+
+        report("per observation", rate(single, batch), "obs/s")
+        report("batched", rate(batched, batch), "obs/s")
+        if grid:
+            report("batched sparse", rate(sparse, batch), "obs/s")
+
+
+@benchmark
+def bench_side_info():
+    '''observe() with side info cached per reset, against recomputing it'''
+    for cls in [games.ConditionedGoals, games.GotoHidden, games.MultiGoals]:
+        print(cls.__name__)
+        for featurizer in [featurizers.SentenceFeaturesRelative(bounds=3),
+                           featurizers.GridFeaturizer(ids=True)]:
+            game = cls(featurizer=featurizer)
+            games.VecMazeGame([game])
+
+            def cached(n):
+                for _ in range(n):
+                    game.observe()
+
+            def recomputed(n):
+                for _ in range(n):
+                    game._invalidate_side_info()
+                    game.observe()
+
+            name = type(featurizer).__name__
+            report(name + ", recomputed", rate(recomputed, 100), "obs/s")
+            report(name + ", cached", rate(cached, 100), "obs/s")
+
+
+def reference_relative_sentences(featurizer, game, id):
+    '''SentenceFeaturesRelative._featurize scanning every item of the game,
+    as it used to, to compare against'''
+    tx, ty = game._items[id].location
+    features = []
+    for item in game._items.values():
+        if not item.visible:
+            continue
+        x, y = item.location
+        dx, dy = tx - x, ty - y
+        if not (-featurizer.bounds < dx < featurizer.bounds and
+                -featurizer.bounds < dy < featurizer.bounds):
+            continue
+        features.append([featurizer._coords2loc(dx, dy)] + item.featurize())
+    return features
+
+
+@benchmark
+def bench_window():
+    '''SentenceFeaturesRelative reading its window against scanning all
+    items, on maps with 10% blocks and water'''
+    featurizer = featurizers.SentenceFeaturesRelative(bounds=5)
+    for size in [10, 32, 64, 100]:
+        game = Sprinkled(map_size=(size, size, size, size),
+                         featurizer=featurizer)
+        id = game.current_agent()
+        assert featurizer._featurize(game, id) == \
+            reference_relative_sentences(featurizer, game, id)
+
+        def scan(n):
+            for _ in range(n):
+                reference_relative_sentences(featurizer, game, id)
+
+        def window(n):
+            for _ in range(n):
+                featurizer._featurize(game, id)
+
+        print("{0}x{0}, {1} items".format(size, len(game._items)))
+        report("scanning all items", rate(scan, 10), "calls/s")
+        report("window", rate(window, 10), "calls/s")
+
+
+@benchmark
+def bench_egocentric():
+    '''Agent centered views: RelativeGridFeaturizer + grid_one_hot, the
+    dense featurizer and EgocentricGridFeaturizer crops, for 64 games'''
+    for size in [10, 32, 64]:
+        print("{0}x{0}".format(size))
+        plain = featurizers.RelativeGridFeaturizer(bounds=5, notify=True)
+        envs = games.VecMazeGame([
+            Sprinkled(map_size=(size, size, size, size))
+            for _ in range(64)], featurizer=plain)
+
+        def strings(n):
+            for game in envs.games:
+                grid, _ = plain.featurize(game, game.current_agent())
+                featurizers.grid_one_hot(game, grid, np)
+
+        report("RelativeGridFeaturizer + grid_one_hot", rate(strings, 64),
+               "views/s")
+        for dense in [
+                featurizers.DenseRelativeGridFeaturizer(bounds=5, notify=True),
+                featurizers.EgocentricGridFeaturizer(bounds=5, notify=True),
+                featurizers.EgocentricGridFeaturizer(bounds=5, notify=True,
+                                                     rotation=1)]:
+            envs = games.VecMazeGame(envs.games, featurizer=dense)
+            out = dense.featurize_batch(envs.games)
+
+            def batch(n):
+                dense.featurize_batch(envs.games, out=out)
+
+            name = type(dense).__name__
+            if getattr(dense, 'rotation', 0):
+                name += ", rotated"
+            report(name + " batch", rate(batch, 64), "views/s")
+
+        def views(n):
+            for game in envs.games:
+                dense.view(game, game.current_agent())
+
+        report("EgocentricGridFeaturizer.view, rotated", rate(views, 64),
+               "views/s")
+
+
+@benchmark
+def bench_packed():
+    '''Size of a batch of 64 observations as float64 planes and int64
+    ids, and packed, and the cost of unpacking'''
+    for featurizer in [featurizers.GridFeaturizer(),
+                       featurizers.SentenceFeaturesAbsolute()]:
+        print(type(featurizer).__name__)
+        envs = [games.SingleGoal(featurizer=featurizer) for _ in range(64)]
+        vec = games.VecMazeGame(envs, dtype=np.float64)
+        packed = games.VecMazeGame(envs, packed=True)
+        nbytes = lambda obs: sum(a.nbytes for a in obs) \
+            if isinstance(obs, tuple) else obs.nbytes
+        report("default", nbytes(vec.observe()) / 1024., "kB")
+        report("packed", nbytes(packed.observe()) / 1024., "kB")
+        report("default observe", rate(lambda n: vec.observe(), 64), "obs/s")
+        report("packed observe", rate(lambda n: packed.observe(), 64),
+               "obs/s")
+        obs = packed.observe()
+        nfeatures = len(packed.vocabulary())
+        if isinstance(obs, tuple):
+            report("unpack_planes", rate(lambda n: encoding.unpack_planes(
+                obs[0], nfeatures), 64), "obs/s")
+        else:
+            report("unpack_tokens", rate(lambda n: encoding.unpack_tokens(
+                obs), 64), "obs/s")
+
+
+@benchmark
+def bench_delta():
+    '''Rows sent per step by grid_one_hot_sparse and by a DeltaEncoder,
+    and the cost of encoding, while the agent wanders'''
+    moves = ['up', 'down', 'left', 'right']
+    for size in [10, 32]:
+        print("{0}x{0}".format(size))
+        featurizer = featurizers.GridFeaturizer()
+        game = Sprinkled(map_size=(size, size, size, size),
+                         featurizer=featurizer)
+        games.VecMazeGame([game])
+        shape = game.get_max_bounds() + (len(game.vocabulary()),)
+        encoder = encoding.DeltaEncoder(shape)
+        full, sent = [], []
+
+        def step(n):
+            for _ in range(n):
+                game.act(moves[randrange(4)])
+                grid, _ = featurizer.featurize(game, game.current_agent())
+                rows = featurizers.grid_one_hot_sparse(game, grid)
+                added, removed, _ = encoder.encode(rows)
+                full.append(len(rows))
+                sent.append(len(added) + len(removed))
+
+        report("encoded", rate(step, 10), "steps/s")
+        report("grid_one_hot_sparse rows", np.mean(full), "rows/step")
+        report("delta rows", np.mean(sent[1:]), "rows/step")
+
+
+@benchmark
+def bench_history():
+    '''Stacking the last 4 observations of 64 games: a deque of them and
+    np.stack, against VecMazeGame(history=4)'''
+    from collections import deque
+    for featurizer in [featurizers.GridFeaturizer(),
+                       featurizers.DenseGridFeaturizer()]:
+        print(type(featurizer).__name__)
+        for size in [10, 32]:
+            envs = [Sprinkled(map_size=(size, size, size, size),
+                              featurizer=featurizer) for _ in range(64)]
+            nactions = len(Sprinkled.all_possible_actions())
+            vec = games.VecMazeGame(envs)
+            frames = deque([vec.reset()[0]] * 4, maxlen=4)
+
+            def stacked(n):
+                for _ in range(n // 64):
+                    obs, _, _ = vec.step(np.random.randint(nactions,
+                                                           size=64))
+                    frames.append(obs[0])
+                    np.stack(frames, axis=1)
+
+            history = games.VecMazeGame(envs, history=4)
+            history.reset()
+
+            def ring(n):
+                for _ in range(n // 64):
+                    history.step(np.random.randint(nactions, size=64))
+
+            report("{0}x{0} deque + np.stack".format(size),
+                   rate(stacked, 64), "steps/s")
+            report("{0}x{0} history=4".format(size), rate(ring, 64),
+                   "steps/s")
+
+
+@benchmark
+def bench_dirty():
+    '''Per step featurization, redrawing the whole map against only the
+    tiles that changed, while the agent wanders'''
+    moves = ['up', 'down', 'left', 'right']
+    for size in [32, 64, 100]:
+        print("{0}x{0}".format(size))
+        for dense in [featurizers.DenseGridFeaturizer(),
+                      featurizers.EgocentricGridFeaturizer(bounds=5,
+                                                           notify=True)]:
+            game = Sprinkled(map_size=(size, size, size, size))
+            games.VecMazeGame([game], featurizer=dense)
+            out = np.zeros(dense.grid_shape(game), dtype=np.uint8)
+
+            def step(n, redraw):
+                for _ in range(n):
+                    game.act(moves[randrange(4)])
+                    if redraw:
+                        game._featurizer_cache.pop(dense, None)
+                    dense.featurize_grid(game, game.current_agent(), out=out)
+
+            name = type(dense).__name__
+            report(name + ", redrawn", rate(lambda n: step(n, True), 10),
+                   "steps/s")
+            report(name + ", dirty tiles",
+                   rate(lambda n: step(n, False), 10), "steps/s")
+
+
+@benchmark
+def bench_fork():
+    '''Copying game state for tree search: fork() against deepcopy'''
+    for cls in ALL_GAMES:
+        game = cls()
+
+        def deep(n):
+            for _ in range(n):
+                copy.deepcopy(game)
+
+        def fork(n):
+            for _ in range(n):
+                game.fork()
+
+        snapshot = game.snapshot()
+
+        def restore(n):
+            for _ in range(n):
+                game.restore(snapshot)
+
+        print(cls.__name__)
+        report("deepcopy", rate(deep, 10), "copies/s")
+        report("fork", rate(fork, 10), "copies/s")
+        report("restore", rate(restore, 10), "calls/s")
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS.keys())
+    for name in names:
+        print("== {0}: {1}".format(name, BENCHMARKS[name].__doc__))
+        BENCHMARKS[name]()
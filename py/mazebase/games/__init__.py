@@ -21,3 +21,5 @@ from .blocks_switches_games import (
     LightKey,
     BlockedDoor,
 )
+from .batch import VecMazeGame
+from .prefetch import PrefetchingGame
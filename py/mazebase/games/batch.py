@@ -0,0 +1,213 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+import numpy as np
+import six
+
+from mazebase.games import featurizers
+from mazebase.games.mazegame import BaseMazeGame, MazeGame
+from mazebase.utils import encoding
+from mazebase.utils.framestack import FrameStack
+from mazebase.utils.vocabulary import Vocabulary
+
+
+class VecMazeGame(object):
+    '''
+    Steps a list of games in lockstep, like batch.lua does for the lua
+    trainer. Observations are turned into numbers with a vocabulary shared
+    by all the games, and stacked along a leading batch dimension.
+
+    Usage:
+        env = VecMazeGame([games.SingleGoal() for _ in range(64)])
+        obs = env.reset()
+        obs, rewards, dones = env.step(actions)
+
+    Actions are indices into all_possible_actions(), or action strings.
+    Games that finish are reset straight away, so the observation returned
+    for them is the first one of the next episode, while rewards and dones
+    belong to the step that was just taken.
+
+    Observations:
+        SentenceFeaturizer:  int array of (batch, sentences, words)
+        BaseGridFeaturizer:  (grid, info) tuple, with grid a few hot array of
+                             (batch, x, y, nfeatures) like grid_one_hot, and
+                             info an int array of (batch, infos, words)
+        DenseGridMixin:      same, with grid a uint8 array of
+                             (batch, nfeatures, height, width)
+
+    With packed=True the observations are compact, to store or send
+    elsewhere: ids are in the smallest dtype for the vocabulary and the
+    features of grids are bit packed, see mazebase.utils.encoding. Unpack
+    grids with encoding.unpack_planes(grid, len(vocabulary()), axis), axis
+    being that of nfeatures above.
+
+    With history=k, the grids, or sentences without a grid, are the last k
+    observations of every game, oldest first: (batch, k, ...). They are a
+    view of a FrameStack that observe(), and so reset() and step(), writes
+    the new observations into, so copy them to keep them. A game starting a
+    new episode starts with zeros as its history.
+    '''
+
+    def __init__(self, games, featurizer=None, dtype=np.float32,
+                 packed=False, history=None):
+        '''
+        games: list of games to step, all using the same kind of featurizer
+        featurizer: overwrites the featurizer of every game if given
+        dtype: dtype of the few hot grid planes
+        packed: return compact observations, see class docstring
+        history: stack the last history observations, see class docstring
+        '''
+        assert len(games) > 0, "VecMazeGame needs at least one game"
+        self.games = games
+        self.dtype = dtype
+        self.packed = packed
+        self.history = history
+        self.__frames = None
+        if featurizer is not None:
+            for game in self.games:
+                game._set_featurizer(featurizer)
+        self.featurizer = self.games[0].featurizer
+
+        self.__vocab = Vocabulary(self.all_possible_features())
+        # Games featurizing to ids have to use the shared ids
+        self._set_vocabulary(self.__vocab)
+        self.__actions = self.all_possible_actions()
+        self.__action_ids = dict((b, a) for a, b in enumerate(self.__actions))
+        # Games that take our action indices as they are
+        self.__same_ids = [self.__shares_action_ids(game)
+                           for game in self.games]
+
+    def __len__(self):
+        return len(self.games)
+
+    def all_possible_features(self):
+        feats = set()
+        for game in self.games:
+            feats.update(game.all_possible_features())
+        return list(sorted(feats))
+
+    def all_possible_actions(self):
+        actions = set()
+        for game in self.games:
+            actions.update(game.all_possible_actions())
+        return list(sorted(actions))
+
+    def _set_stats(self, stats):
+        for game in self.games:
+            game._set_stats(stats)
+
+    def _set_vocabulary(self, vocab):
+        for game in self.games:
+            game._set_vocabulary(vocab)
+
+    def vocabulary(self):
+        return self.__vocab
+
+    @classmethod
+    def all_features(cls):
+        return []
+
+    def reset(self):
+        ''' Resets every game and returns the stacked observations '''
+        for game in self.games:
+            game.reset()
+        if self.__frames is not None:
+            self.__frames.clear()
+        return self.observe()
+
+    def observe(self):
+        observations = (game.observe()['observation'] for game in self.games)
+        if isinstance(self.featurizer, featurizers.BaseGridFeaturizer):
+            # Stacked while observing, so the nested lists of only one grid
+            # are alive at a time instead of those of the whole batch
+            infos = []
+
+            def grids():
+                for grid, info in observations:
+                    infos.append(info)
+                    yield grid
+            grid = self.__push(self.__stack_grids, grids())
+            return grid, self.__stack_sentences(infos)
+        return self.__push(self.__stack_sentences, list(observations))
+
+    def step(self, actions):
+        '''
+        Performs actions[i] in games[i] for the acting agent.
+
+        Returns:
+            observations: stacked observations, see class docstring
+            rewards: float array of rewards of the last action
+            dones: bool array, True where the action ended the episode
+        '''
+        assert len(actions) == len(self.games), \
+            "Need one action per game, got {0} for {1} games".format(
+                len(actions), len(self.games))
+        rewards = np.zeros(len(self.games), dtype=np.float32)
+        dones = np.zeros(len(self.games), dtype=np.bool_)
+        for i, (game, action) in enumerate(zip(self.games, actions)):
+            if isinstance(action, six.string_types):
+                game.act(action)
+            elif self.__same_ids[i]:
+                game.act_index(int(action))
+            else:
+                game.act(self.__actions[action])
+            rewards[i] = game.reward()
+            if game.is_over():
+                dones[i] = True
+                game.reset()
+                if self.__frames is not None:
+                    self.__frames.clear(i)
+        return self.observe(), rewards, dones
+
+    def __shares_action_ids(self, game):
+        # A game's action space only grows at the end, see
+        # BaseMazeGame._add_agent, so if it starts with our actions it
+        # always will. Other wrappers get action strings
+        if isinstance(game, MazeGame):
+            return all(self.__shares_action_ids(g) for g in game.games)
+        return isinstance(game, BaseMazeGame) and \
+            game._action_space[:len(self.__actions)] == self.__actions
+
+    def action_index(self, action):
+        ''' Index of an action string in all_possible_actions() '''
+        return self.__action_ids[action]
+
+    def __push(self, stack, observations):
+        # With history, observations are written straight into the frames
+        if self.history is None:
+            return stack(observations)
+        if self.__frames is None:
+            frame = stack(observations)
+            self.__frames = FrameStack(frame.shape[1:], self.history,
+                                       batch=len(self.games),
+                                       dtype=frame.dtype)
+            return self.__frames.push(frame)
+        stack(observations, out=self.__frames.slot())
+        return self.__frames.push()
+
+    def __stack_sentences(self, observations, out=None):
+        dtype = encoding.token_dtype(len(self.__vocab)) if self.packed \
+            else np.int64
+        return featurizers.vocabify_batch(self.games, observations, out=out,
+                                          dtype=dtype)
+
+    def __stack_grids(self, grids, out=None):
+        dense = isinstance(self.featurizer, featurizers.DenseGridMixin)
+        if dense:
+            grids = list(grids)
+        if self.packed:
+            grids = encoding.pack_planes(np.stack(grids), axis=1) if dense \
+                else featurizers.grid_packed_batch(self.games, grids)
+            if out is None:
+                return grids
+            out[...] = grids
+            return out
+        if dense:
+            if out is None:
+                return np.stack(grids)
+            for frame, grid in zip(out, grids):
+                frame[...] = grid
+            return out
+        return featurizers.grid_one_hot_batch(self.games, grids, out=out,
+                                              dtype=self.dtype)
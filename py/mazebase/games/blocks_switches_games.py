@@ -31,9 +31,8 @@ class SwitchesAgent(agents.SingleTileMovable, agents.Toggling):
 
 def _est(game, s, e):
     '''shorthand to estimate reward for an agent to move from s to e'''
-    visited, path = creationutils.dijkstra(
-        game, s, creationutils.agent_movefunc, True)
-    return -visited[e]  # Returns distance, which is negation of reward
+    field = game._distance_field(s, weighted=True)
+    return -field.distance(tuple(e))  # Returns distance, which is negation of reward
 
 
 def pbwps(p, start, end):
@@ -55,11 +54,11 @@ class PushBlock(PBSType):
     def _reset(self):
         super(PushBlock, self)._reset()
 
-        self.sw_loc = choice(creationutils.empty_locations(self))
+        self.sw_loc = creationutils.random_empty_location(self)
         self.sw = mi.Switch(location=self.sw_loc)
         self._add_item(self.sw)
 
-        x, y = choice(creationutils.empty_locations(self))
+        x, y = creationutils.random_empty_location(self)
         self.pushable = mi.Pushable(location=(x, y))
         self._add_item(self.pushable)
 
@@ -69,13 +68,11 @@ class PushBlock(PBSType):
             raise MazeException("No path to sw")
         self.waypoints = pbwps(p, self.pushable.location, self.sw.location)
 
-        x, y = choice(creationutils.empty_locations(self,
-                                                    bad_blocks=[mi.Block]))
+        x, y = creationutils.random_empty_location(
+            self, bad_blocks=[mi.Block])
         self.agent = PushBlockAgent(location=(x, y))
         self._add_agent(self.agent, "PushBlockAgent")
-        visited, _ = creationutils.dijkstra(self, (x, y),
-                                            creationutils.agent_movefunc)
-        if self.waypoints[0] not in visited:
+        if not self._components().connected((x, y), self.waypoints[0]):
             raise MazeException("No path to pushblock")
 
     def _side_information(self):
@@ -104,7 +101,7 @@ class PushBlockCardinal(PBSType):
     def _reset(self):
         super(PushBlockCardinal, self)._reset()
 
-        x, y = choice(creationutils.empty_locations(self))
+        x, y = creationutils.random_empty_location(self)
         self.pushable = mi.Pushable(location=(x, y))
         self._add_item(self.pushable)
         self.direction = choice([self.FEATURE.UP,
@@ -128,8 +125,8 @@ class PushBlockCardinal(PBSType):
         closest = min(self.goals, key=lambda loc: visited[loc])
         self.waypoints = pbwps(p, self.pushable.location, closest)
 
-        x, y = choice(creationutils.empty_locations(self,
-                                                    bad_blocks=[mi.Block]))
+        x, y = creationutils.random_empty_location(
+            self, bad_blocks=[mi.Block])
         self.agent = PushBlockAgent(location=(x, y))
         self._add_agent(self.agent, "PushBlockCardinalAgent")
 
@@ -170,23 +167,21 @@ class Switches(PBSType):
     def _reset(self):
         super(Switches, self)._reset()
 
-        loc = choice(creationutils.empty_locations(self, bad_blocks=[mi.Block]))
+        loc = creationutils.random_empty_location(self, bad_blocks=[mi.Block])
         self.agent = SwitchesAgent(location=loc)
         self._add_agent(self.agent, "SwitchesAgent")
-
-        visited, _ = creationutils.dijkstra(self, loc,
-                                            creationutils.agent_movefunc)
+        agent_loc = loc
 
         self._switches = []
         for _ in range(self.n_switches):
-            loc = choice(creationutils.empty_locations(self))
+            loc = creationutils.random_empty_location(self)
             self._switches.append(mi.Switch(
                 location=loc,
                 nstates=self.switch_states,
                 start_state=choice(range(self.switch_states)),
             ))
             self._add_item(self._switches[-1])
-            if loc not in visited:
+            if not self._components().connected(agent_loc, loc):
                 raise MazeException("No path to goal")
 
     def _finished(self):
@@ -203,7 +198,6 @@ class Switches(PBSType):
         '''Greedy solution that visits each switch in turn'''
         best = 1e100
         sw_colors = [sw.state for sw in self._switches]
-        print(sw_colors)
         for i, sw in enumerate(self._switches):
             tmp = [(sw.state - c) % self.switch_states for c in sw_colors]
             # Heuristic for perferring not needing to flip switches
@@ -213,10 +207,10 @@ class Switches(PBSType):
         loc = self.agent.location
         r = 0
         for i, sw in enumerate(self._switches):
-            visited, path = creationutils.dijkstra(
-                self, loc, creationutils.agent_movefunc, True)
-            ind, loc = min(enumerate(to_visit), key=lambda x: visited[x[1]])
-            r -= visited[loc]  # Reward is negative of path
+            field = self._distance_field(loc, weighted=True)
+            ind, loc = min(enumerate(to_visit),
+                           key=lambda x: field.distance(x[1]))
+            r -= field.distance(loc)  # Reward is negative of path
             to_visit.remove(loc)
         return super(Switches,
                      self)._calculate_approximate_reward() + \
@@ -262,8 +256,8 @@ class LightKey(PBSType):
         super(LightKey, self)._reset()
 
         # Add the goal, agent, and switch
-        loc = choice(creationutils.empty_locations(
-            self, bad_blocks=[mi.Block, mi.Door]))
+        loc = creationutils.random_empty_location(
+            self, bad_blocks=[mi.Block, mi.Door])
         self.goal = mi.Goal(location=loc)
         self._add_item(self.goal)
         side = choice([-1, 1])
@@ -281,9 +275,9 @@ class LightKey(PBSType):
         self.agent = SwitchesAgent(location=loc)
         self._add_agent(self.agent, "LightKeyAgent")
 
-        visited, _ = creationutils.dijkstra(self, loc,
-                                            creationutils.agent_movefunc)
-        if self.goal.location not in visited or self.sw.location not in visited:
+        components = self._components()
+        if (not components.connected(loc, self.goal.location) or
+                not components.connected(loc, self.sw.location)):
             raise MazeException("No path to goal")
 
     def _step(self):
@@ -304,9 +298,11 @@ class LightKey(PBSType):
         x, y = self.door.location
         saved = self._approx_reward_map[x][y]
         self._approx_reward_map[x][y] = -1e100
+        self._invalidate_distance_fields()
         r = _est(self, self.agent.location, self.goal.location)
         if r < -1e90:
             self._approx_reward_map[x][y] = saved
+            self._invalidate_distance_fields()
             r = _est(self, self.agent.location, self.sw.location) + \
                 _est(self, self.sw.location, self.goal.location)
         return super(LightKey, self)._calculate_approximate_reward() + r
@@ -326,20 +322,18 @@ class BlockedDoor(PBSType):
         super(BlockedDoor, self)._reset()
 
         # Add the goal, and agent
-        loc = choice(creationutils.empty_locations(
-            self, bad_blocks=[mi.Block, mi.Door]))
+        loc = creationutils.random_empty_location(
+            self, bad_blocks=[mi.Block, mi.Door])
         self.goal = mi.Goal(location=loc)
         self._add_item(self.goal)
 
-        loc = choice(creationutils.empty_locations(
-            self, bad_blocks=[mi.Block, mi.Door]))
+        loc = creationutils.random_empty_location(
+            self, bad_blocks=[mi.Block, mi.Door])
         self.agent = PushBlockAgent(location=loc)
         self._add_agent(self.agent, "BlockedDoorAgent")
 
         self._remove_item(self.pushable.id)
-        visited, _ = creationutils.dijkstra(self, loc,
-                                            creationutils.agent_movefunc)
-        if self.goal.location not in visited:
+        if not self._components().connected(loc, self.goal.location):
             raise MazeException("No path to goal")
         self._add_item(self.pushable)
 
@@ -353,8 +347,10 @@ class BlockedDoor(PBSType):
     def _calculate_approximate_reward(self):
         r = _est(self, self.agent.location, self.goal.location)
         if r < -1e90:
-            self._remove_item(self.pushable.id)
-            r = _est(self, self.agent.location, self.goal.location)
+            # Through the pushable, without taking it off the map
+            field = self._distance_field(
+                self.agent.location, creationutils.through_pushable_movefunc,
+                weighted=True)
+            r = -field.distance(self.goal.location)
             r -= 4 * self.turn_penalty  # Heuristic for pushing block
-            self._add_item(self.pushable)
         return super(BlockedDoor, self)._calculate_approximate_reward() + r
@@ -35,19 +35,20 @@ def CurriculumWrappedGame(cls, curriculums=None, **kwargs):
         for cur in curriculums:
             cur.make_hardest()
 
-    max_bounds = game.get_max_bounds
-    orig_reset = game.reset
+    # Through the class rather than the methods of game, so that the
+    # methods work on forks of game too
+    base = type(game)
 
     def get_max_bounds(self):
         if 'map_size' in curriculums:
             _, max_w, _, max_h = curriculums['map_size'].max
             return max_w, max_h
-        return max_bounds()
+        return base.get_max_bounds(self)
 
     def reset(self):
         for kw, val in curriculums.items():
             setattr(self, kw, val.get())
-        orig_reset()
+        base.reset(self)
 
     for func in [make_easier, make_harder, make_easiest, make_hardest,
                  get_max_bounds, reset]:
@@ -4,6 +4,7 @@ from __future__ import print_function
 from __future__ import unicode_literals
 import abc
 import itertools
+import numpy as np
 import six
 from mazebase.utils.mazeutils import AbsoluteLocationUtils
 
@@ -16,11 +17,43 @@ MAX_SENTENCE_SIZE = 10
 
 @six.add_metaclass(abc.ABCMeta)
 class Featurizer(object):
+    '''
+    Featurizers created with ids=True output token ids of
+    game.vocabulary() instead of feature strings, which skips building and
+    hashing strings every step. The strings are easier to debug with.
+    '''
+    ids = False
 
     @abc.abstractmethod
     def featurize(self, game, id):
         pass
 
+    def _vocab(self, game):
+        # Vocabulary to output ids of, None to output strings
+        return game.vocabulary() if self.ids else None
+
+    @staticmethod
+    def _item_features(item, vocab):
+        if vocab is None:
+            return item.featurize()
+        return item.featurize_ids(vocab)
+
+    @staticmethod
+    def _word(word, vocab):
+        return word if vocab is None else vocab[word]
+
+    def _cached_side_info(self, game, make):
+        '''
+        make(game), this featurizer's version of the side info, computed
+        once per reset like game._side_info(). Returns a copy, so it can be
+        padded in place.
+        '''
+        cache = game._featurizer_cache.setdefault('side_info', {})
+        key = (self, self._vocab(game))
+        if key not in cache:
+            cache[key] = make(game)
+        return [list(feat) for feat in cache[key]]
+
     @abc.abstractmethod
     def all_possible_features(self, game):
         '''Extra features added by the featurizer'''
@@ -32,21 +65,34 @@ class BaseGridFeaturizer(Featurizer):
     def __init__(self, *args, **kwargs):
         self.max_info_length = kwargs.pop('max_info_length', 10)
         self.max_infos = kwargs.pop('max_infos', 10)
+        self.ids = kwargs.pop('ids', False)
 
     def featurize(self, game, id):
+        if game.stats is not None:
+            with game.stats.timer('featurize.grid'):
+                grid = self._featurize_grid(game, id)
+            with game.stats.timer('featurize.side_info'):
+                return grid, self._featurize_side_info(game, id)
         features = (self._featurize_grid(game, id),
                     self._featurize_side_info(game, id))
         return features
 
     def _featurize_side_info(self, game, id):
+        return self._cached_side_info(game, self.__featurize_side_info)
+
+    def __featurize_side_info(self, game):
+        vocab = self._vocab(game)
         features = game._side_info()
+        if vocab is not None:
+            features = [vocab.encode(feat) for feat in features]
         if len(features) > self.max_info_length:
             raise Exception("Too much side info too long to featurize")
         features += [[] for i in range(self.max_infos - len(features))]
+        pad = self._word("", vocab)
         for feat in features:
             if len(feat) > self.max_info_length:
                 raise Exception("Info feature too long")
-            feat += [""] * (self.max_info_length - len(feat))
+            feat += [pad] * (self.max_info_length - len(feat))
         return features
 
     @abc.abstractmethod
@@ -60,17 +106,40 @@ class SentenceFeaturizer(Featurizer):
     def __init__(self, *args, **kwargs):
         self.max_sentence_length = kwargs.pop('max_sentence_length', 10)
         self.max_sentences = kwargs.pop('max_sentences', 100)
+        self.ids = kwargs.pop('ids', False)
 
     def featurize(self, game, id):
-        features = self._featurize(game, id) + game._side_info()
+        if game.stats is not None:
+            with game.stats.timer('featurize.objects'):
+                features = self._featurize(game, id)
+            with game.stats.timer('featurize.side_info'):
+                features += self._side_info(game)
+        else:
+            features = self._featurize(game, id) + self._side_info(game)
         if len(features) > self.max_sentences:
             raise Exception("Too many objects to featurize")
         # Do padding for features
         features += [[] for i in range(self.max_sentences - len(features))]
+        pad = self._word("", self._vocab(game))
         for feat in features:
             if len(feat) > self.max_sentence_length:
                 raise Exception("Sentence feature too long")
-            feat += [""] * (self.max_sentence_length - len(feat))
+            feat += [pad] * (self.max_sentence_length - len(feat))
+        return features
+
+    def _side_info(self, game):
+        return self._cached_side_info(game, self.__side_info)
+
+    def __side_info(self, game):
+        vocab = self._vocab(game)
+        features = game._side_info()
+        if vocab is not None:
+            features = [vocab.encode(feat) for feat in features]
+        pad = self._word("", vocab)
+        for feat in features:
+            if len(feat) > self.max_sentence_length:
+                raise Exception("Sentence feature too long")
+            feat += [pad] * (self.max_sentence_length - len(feat))
         return features
 
     @abc.abstractmethod
@@ -83,6 +152,13 @@ class AbsoluteLocationMixin(AbsoluteLocationUtils):
     def all_possible_features(self, game):
         return self._get_abs_loc_features(game)
 
+    def _location_ids(self, game, vocab):
+        '''Table of the ids of the location features, [x][y]'''
+        max_w, max_h = game.get_max_bounds()
+        return vocab.cached((AbsoluteLocationMixin, max_w, max_h), lambda: [
+            [vocab.get(self._coords2loc(x, y)) for y in range(max_h)]
+            for x in range(max_w)])
+
 
 class RelativeLocationMixin(object):
     '''Featurizer uses relative locations.
@@ -103,6 +179,14 @@ class RelativeLocationMixin(object):
     def _coords2loc(x, y):
         return "d{0}x{1}y".format(x, y)
 
+    def _location_ids(self, vocab):
+        '''Table of the ids of the location features, [dx + bounds][dy +
+        bounds]'''
+        b = self.bounds
+        return vocab.cached((RelativeLocationMixin, b), lambda: [
+            [vocab.get(self._coords2loc(x, y)) for y in range(-b, b)]
+            for x in range(-b, b)])
+
 ########################
 # Featurizers
 ########################
@@ -121,15 +205,17 @@ class GridFeaturizer(BaseGridFeaturizer):
     '''
 
     def _featurize_grid(self, game, id):
+        vocab = self._vocab(game)
         max_w, max_h = game.get_max_bounds()
         features = [[[] for y in range(max_w)]
                      for x in range(max_h)]
-        for (x, y) in itertools.product(range(game.width), range(game.height)):
-            itemlst = game._map[x][y]
+        xs, ys = game._map.count.nonzero()
+        for (x, y) in zip(xs.tolist(), ys.tolist()):
+            itemlst = game._map.at(x, y)
             for item in itemlst:
                 if not item.visible:
                     continue
-                features[x][y] += item.featurize()
+                features[x][y] += self._item_features(item, vocab)
 
         return features
 
@@ -158,23 +244,29 @@ class RelativeGridFeaturizer(AbsoluteLocationMixin, BaseGridFeaturizer):
         super(RelativeGridFeaturizer, self).__init__(**kwargs)
 
     def _featurize_grid(self, game, id):
+        vocab = self._vocab(game)
         tx, ty = game._items[id].location
         max_w, max_h = game.get_max_bounds()
         features = [[[] for y in range(2 * self.bounds - 1)]
                      for x in range(2 * self.bounds - 1)]
         center = self.bounds - 1
-        features[center][center].append(self._coords2loc(tx, ty))
+        if vocab is None:
+            features[center][center].append(self._coords2loc(tx, ty))
+        else:
+            features[center][center].append(
+                self._location_ids(game, vocab)[tx][ty])
+        out_of_bounds = self._word("OUT_OF_BOUNDS", vocab)
         for (x, y) in itertools.product(range(2 * self.bounds - 1),
                                         range(2 * self.bounds - 1)):
             nx, ny = tx + x - center, ty + y - center
             if not (0 <= nx < game.width and 0 <= ny < game.height):
-                if self.notify: features[x][y].append("OUT_OF_BOUNDS")
+                if self.notify: features[x][y].append(out_of_bounds)
                 continue
-            itemlst = game._map[nx][ny]
+            itemlst = game._map.at(nx, ny)
             for item in itemlst:
                 if not item.visible:
                     continue
-                features[x][y] += item.featurize()
+                features[x][y] += self._item_features(item, vocab)
 
         return features
 
@@ -184,6 +276,282 @@ class RelativeGridFeaturizer(AbsoluteLocationMixin, BaseGridFeaturizer):
         return list(sorted(fts))
 
 
+@six.add_metaclass(abc.ABCMeta)
+class DenseGridMixin(object):
+    '''
+    Grid featurizer that writes few hot feature planes into a uint8 array of
+    (nfeatures, height, width), with the planes in the order of
+    game.vocabulary() like grid_one_hot, instead of building lists of
+    strings.
+
+    featurize() returns a new array every call, use
+    featurize_grid(game, id, out=buffer) to reuse one, or featurize_batch
+    to fill a (batch, nfeatures, height, width) array for many games.
+
+    Items whose features only depend on their class, like blocks, water and
+    agents, are copied from the TileMap's occupancy planes in one go, only
+    the others go through item.featurize_ids().
+
+    Featurizers covering the whole map keep their planes with the game and
+    only redraw the tiles that changed since the last call, see
+    _map_planes().
+
+    Subclasses implement grid_shape() and featurize_grid(), which can start
+    from _grid_out().
+    '''
+    @abc.abstractmethod
+    def grid_shape(self, game):
+        '''Shape of the array featurize_grid writes'''
+        pass
+
+    def _featurize_grid(self, game, id):
+        return self.featurize_grid(game, id)
+
+    @abc.abstractmethod
+    def featurize_grid(self, game, id, out=None):
+        '''Writes the feature planes into out, if given, and returns them'''
+        pass
+
+    def _grid_out(self, game, out):
+        # out zeroed, or a new array if it is None
+        shape = self.grid_shape(game)
+        if out is None:
+            return np.zeros(shape, dtype=np.uint8)
+        assert out.shape == shape, \
+            "out has shape {0}, need {1}".format(out.shape, shape)
+        out.fill(0)
+        return out
+
+    def featurize_batch(self, games, ids=None, out=None):
+        '''
+        featurize_grid for every game, stacked. ids defaults to the current
+        agent of every game. The games must share a vocabulary, like the
+        games of a VecMazeGame.
+        '''
+        if ids is None:
+            ids = [game.current_agent() for game in games]
+        if out is None:
+            out = np.zeros((len(games),) + self.grid_shape(games[0]),
+                           dtype=np.uint8)
+        for game, id, grid in zip(games, ids, out):
+            self.featurize_grid(game, id, out=grid)
+        return out
+
+    @staticmethod
+    def _class_planes(vocab, cls):
+        # Planes of all items of class cls, None if it depends on the item
+        def make():
+            features = cls.class_features()
+            if features is None:
+                return None
+            return sorted(set(vocab.encode(features)))
+        return vocab.cached((DenseGridMixin, cls), make)
+
+    def _draw(self, game, vocab, out, x0, x1, y0, y1, ox, oy, channel=None):
+        '''Sets the planes of map tiles [x0, x1) x [y0, y1) in out, with
+        tile (x0, y0) at out[:, oy, ox]. channel maps token ids to planes
+        of out, if they differ.'''
+        tmap = game._map
+        dst = out[:, oy:oy + y1 - y0, ox:ox + x1 - x0]
+        for cls, plane in tmap.planes.items():
+            region = plane[x0:x1, y0:y1]
+            planes = None if cls in tmap.hidden else \
+                self._class_planes(vocab, cls)
+            if planes is not None:
+                region = region.T
+                for i in planes:
+                    if channel is not None:
+                        i = channel[i]
+                    np.logical_or(dst[i], region, out=dst[i])
+                continue
+            xs, ys = region.nonzero()
+            for x, y in zip(xs.tolist(), ys.tolist()):
+                for item in tmap.at(x0 + x, y0 + y):
+                    if type(item) is cls and item.visible:
+                        for i in item.featurize_ids(vocab):
+                            if channel is not None:
+                                i = channel[i]
+                            dst[i, y, x] = 1
+
+    def _map_planes(self, game, vocab, shape, pad=0, channel=None):
+        '''
+        Planes of the whole map, padded with pad tiles of OUT_OF_BOUNDS if
+        notify is set, so tile (x, y) is at [:, pad + y, pad + x]. They are
+        kept with the game, and after the first call only the tiles that
+        changed since the last one are redrawn, see TileMap.dirty_since().
+        channel is as for _draw.
+        '''
+        tmap = game._map
+        cached = game._featurizer_cache.get(self)
+        if cached is not None:
+            planes, kept_map, kept_vocab, kept_channel, changes = cached
+            dirty = tmap.dirty_since(changes) if kept_map is tmap and \
+                kept_vocab is vocab and kept_channel is channel and \
+                planes.shape == shape else None
+            if dirty is not None:
+                for x, y in set(dirty):
+                    tile = planes[:, pad + y, pad + x]
+                    tile.fill(0)
+                    for item in tmap.at(x, y):
+                        if item.visible:
+                            for i in item.featurize_ids(vocab):
+                                tile[i if channel is None else channel[i]] = 1
+                game._featurizer_cache[self] = (planes, tmap, vocab, channel,
+                                                tmap.changes)
+                return planes
+            if planes.shape == shape:
+                planes.fill(0)
+            else:
+                planes = np.zeros(shape, dtype=np.uint8)
+        else:
+            planes = np.zeros(shape, dtype=np.uint8)
+        if pad and self.notify:
+            i = vocab["OUT_OF_BOUNDS"]
+            oob = planes[i if channel is None else channel[i]]
+            oob.fill(1)
+            oob[pad:pad + game.height, pad:pad + game.width] = 0
+        self._draw(game, vocab, planes, 0, game.width, 0, game.height,
+                   pad, pad, channel)
+        game._featurizer_cache[self] = (planes, tmap, vocab, channel,
+                                        tmap.changes)
+        return planes
+
+
+class DenseGridFeaturizer(DenseGridMixin, GridFeaturizer):
+    '''
+    GridFeaturizer writing a (nfeatures, max height, max width) uint8 array,
+    see DenseGridMixin.
+
+    Returns:
+        [
+            grid_features: uint8 array of few hot feature planes,
+            side_info: game specific info blocks, in an ordered list
+        ]
+    '''
+    def grid_shape(self, game):
+        max_w, max_h = game.get_max_bounds()
+        return (len(game.vocabulary()), max_h, max_w)
+
+    def featurize_grid(self, game, id, out=None):
+        # Copied from the planes kept with the game, see _map_planes
+        shape = self.grid_shape(game)
+        planes = self._map_planes(game, game.vocabulary(), shape)
+        if out is None:
+            return planes.copy()
+        assert out.shape == shape, \
+            "out has shape {0}, need {1}".format(out.shape, shape)
+        np.copyto(out, planes)
+        return out
+
+
+class DenseRelativeGridFeaturizer(DenseGridMixin, RelativeGridFeaturizer):
+    '''
+    RelativeGridFeaturizer writing a (nfeatures, 2 * bounds - 1,
+    2 * bounds - 1) uint8 array centered on the agent, see DenseGridMixin.
+
+    kwargs:
+        bounds
+        notify = add OUT_OF_BOUNDS features or not
+    '''
+    def grid_shape(self, game):
+        size = 2 * self.bounds - 1
+        return (len(game.vocabulary()), size, size)
+
+    def featurize_grid(self, game, id, out=None):
+        vocab = game.vocabulary()
+        out = self._grid_out(game, out)
+        tx, ty = game._items[id].location
+        center = self.bounds - 1
+        size = 2 * self.bounds - 1
+        x0, y0 = max(0, tx - center), max(0, ty - center)
+        x1 = min(game.width, tx - center + size)
+        y1 = min(game.height, ty - center + size)
+        ox, oy = x0 - (tx - center), y0 - (ty - center)
+        if self.notify:
+            oob = out[vocab["OUT_OF_BOUNDS"]]
+            oob.fill(1)
+            oob[oy:oy + y1 - y0, ox:ox + x1 - x0] = 0
+        self._draw(game, vocab, out, x0, x1, y0, y1, ox, oy)
+        out[self._location_ids(game, vocab)[tx][ty], center, center] = 1
+        return out
+
+
+class EgocentricGridFeaturizer(DenseRelativeGridFeaturizer):
+    '''
+    DenseRelativeGridFeaturizer that crops its view out of feature planes of
+    the whole map, padded with bounds - 1 tiles of OUT_OF_BOUNDS on every
+    side, so there is nothing to check per tile.
+
+    Those planes only hold the features items can have, see
+    tile_features(). view(game, id) returns the crop without copying, as a
+    view of (len(tile_features), 2 * bounds - 1, 2 * bounds - 1) that stays
+    valid until the next call for the game. featurize() and featurize_grid()
+    spread it over all features, like DenseRelativeGridFeaturizer, and add
+    the location of the agent.
+
+    The view can be rotated to the agent's frame. Agents don't know which
+    way they face, so pass that in.
+
+    kwargs:
+        bounds
+        notify = add OUT_OF_BOUNDS features or not
+        rotation = quarter turns to rotate the view by, as in
+            np.rot90(view, turns, axes=(1, 2)), or a function
+            (game, id) -> quarter turns
+    '''
+    def __init__(self, **kwargs):
+        self.rotation = kwargs.pop('rotation', 0)
+        super(EgocentricGridFeaturizer, self).__init__(**kwargs)
+
+    def tile_features(self, game):
+        '''Token ids of the planes of view(), the features of the classes
+        of items on the map, and OUT_OF_BOUNDS'''
+        return self._tile_features(game, game.vocabulary())[0]
+
+    def _tile_features(self, game, vocab):
+        # (token ids, {token id: plane}), for the classes on the map now
+        classes = frozenset(game._map.planes)
+
+        def make():
+            ids = set([vocab["OUT_OF_BOUNDS"]])
+            for cls in classes:
+                features = cls.class_features()
+                ids.update(vocab.encode(
+                    cls.all_features() if features is None else features))
+            ids = sorted(ids)
+            return ids, dict((b, a) for a, b in enumerate(ids))
+        return vocab.cached((EgocentricGridFeaturizer, classes), make)
+
+    def _planes(self, game, vocab):
+        # The padded planes of the whole map, kept with the game
+        ids, channel = self._tile_features(game, vocab)
+        pad = self.bounds - 1
+        shape = (len(ids), game.height + 2 * pad, game.width + 2 * pad)
+        return self._map_planes(game, vocab, shape, pad, channel)
+
+    def view(self, game, id):
+        '''The view of agent id, see the class docstring'''
+        planes = self._planes(game, game.vocabulary())
+        tx, ty = game._items[id].location
+        size = 2 * self.bounds - 1
+        view = planes[:, ty:ty + size, tx:tx + size]
+        turns = self.rotation(game, id) if callable(self.rotation) \
+            else self.rotation
+        if turns % 4:
+            view = np.rot90(view, turns, axes=(1, 2))
+        return view
+
+    def featurize_grid(self, game, id, out=None):
+        vocab = game.vocabulary()
+        out = self._grid_out(game, out)
+        view = self.view(game, id)
+        out[self._tile_features(game, vocab)[0]] = view
+        tx, ty = game._items[id].location
+        center = self.bounds - 1
+        out[self._location_ids(game, vocab)[tx][ty], center, center] = 1
+        return out
+
+
 class SentenceFeaturesAbsolute(AbsoluteLocationMixin, SentenceFeaturizer):
     '''
     A list of featurizations of objects in the map. The objects are given as
@@ -198,13 +566,20 @@ class SentenceFeaturesAbsolute(AbsoluteLocationMixin, SentenceFeaturizer):
         super(SentenceFeaturesAbsolute, self).__init__(**kwargs)
 
     def _featurize(self, game, id):
+        vocab = self._vocab(game)
+        if vocab is not None:
+            locations = self._location_ids(game, vocab)
         max_w, max_h = game.get_max_bounds()
         features = []
         for id, item in game._items.items():
             if not item.visible:
                 continue
-            feat = item.featurize()
-            location_feature = self._coords2loc(*item.location)
+            feat = self._item_features(item, vocab)
+            if vocab is None:
+                location_feature = self._coords2loc(*item.location)
+            else:
+                x, y = item.location
+                location_feature = locations[x][y]
             features.append([location_feature] + feat)
 
         return features
@@ -215,6 +590,8 @@ class SentenceFeaturesRelative(RelativeLocationMixin, SentenceFeaturizer):
     A list of featurizations of objects in the map. The objects are given as
     "sentences", with an absolute location in the map. You can initialize
     this with a parameter that decides how far the agent can see.
+    When there are more items than tiles in sight, only those tiles are
+    read, so the cost depends on bounds and not on the map size.
 
     kwargs:
         max_sentence_length
@@ -223,19 +600,35 @@ class SentenceFeaturesRelative(RelativeLocationMixin, SentenceFeaturizer):
     '''
 
     def _featurize(self, game, id):
+        vocab = self._vocab(game)
+        if vocab is not None:
+            locations = self._location_ids(vocab)
         tx, ty = game._items[id].location
-        max_w, max_h = game.get_max_bounds()
+        b = self.bounds
+        if len(game._items) <= (2 * b - 1) ** 2:
+            # Few items, cheaper to check them all
+            items = game._items.values()
+        else:
+            # Only look at the tiles in sight, in the order of game._items
+            tmap = game._map
+            x0, y0 = max(0, tx - b + 1), max(0, ty - b + 1)
+            xs, ys = tmap.count[x0:tx + b, y0:ty + b].nonzero()
+            items = [item for x, y in zip(xs.tolist(), ys.tolist())
+                     for item in tmap.at(x0 + x, y0 + y)]
+            items.sort(key=lambda item: item.handle)
         features = []
-        for id, item in game._items.items():
+        for item in items:
             if not item.visible:
                 continue
             x, y = item.location
             dx, dy = tx - x, ty - y
-            if not (-self.bounds < dx < self.bounds and
-                    -self.bounds < dy < self.bounds):
+            if not (-b < dx < b and -b < dy < b):
                 continue
-            feat = item.featurize()
-            location_feature = self._coords2loc(dx, dy)
+            feat = self._item_features(item, vocab)
+            if vocab is None:
+                location_feature = self._coords2loc(dx, dy)
+            else:
+                location_feature = locations[dx + b][dy + b]
             features.append([location_feature] + feat)
 
         return features
@@ -252,8 +645,7 @@ def vocabify(game, observation, np=None):
 
     Pass in numpy module to np to use it instead of lists.
     '''
-    vocab = dict([(b, a) for a, b in
-                  enumerate(game.all_possible_features())])
+    vocab = game.vocabulary().ids
     if np is None:
         for sent in observation:
             for i, word in enumerate(sent):
@@ -278,8 +670,7 @@ def grid_one_hot(game, observation, np=None):
     pass in the numpy module to np to return a numpy array,
     which is far more efficient than using lists.
     '''
-    vocab = dict([(b, a) for a, b in
-                  enumerate(game.all_possible_features())])
+    vocab = game.vocabulary().ids
     if np is None:
         for x, col in enumerate(observation):
             for y, lst in enumerate(col):
@@ -306,11 +697,136 @@ def grid_one_hot_sparse(game, observation, np=None):
     Mostly used for python-lua bridge, since the communication costs
     there are relatively high
     '''
-    vocab = dict([(b, a) for a, b in
-                  enumerate(game.all_possible_features())])
+    vocab = game.vocabulary().ids
     res = []
     for x, col in enumerate(observation):
         for y, lst in enumerate(col):
             for feat in lst:
                 res.append((x, y, vocab[feat]))
     return res
+
+
+def vocabify_batch(games, observations=None, out=None, dtype=np.int64):
+    '''
+    vocabify for a whole batch: returns the observations of games[i] as
+    out[i], an array of (batch, sentences, words) padded with the id of "".
+    Sentences and side_info both work. observations default to observing
+    every game, taking the side_info of grid featurizers. Pass
+    encoding.token_dtype(len(vocabulary)) as dtype for compact ids.
+
+    The games must share a vocabulary, like the games of a VecMazeGame, and
+    a kind of featurizer. Observations of featurizers with ids=True are
+    taken as they are.
+    '''
+    vocab = games[0].vocabulary()
+    observations = _batch_observations(games, observations, 1)
+    lookup = None if games[0].featurizer.ids else vocab.ids.__getitem__
+    nsent = max([0] + [len(obs) for obs in observations])
+    nword = max([0] + [len(sent) for obs in observations for sent in obs])
+    if out is None:
+        out = np.empty((len(observations), nsent, nword), dtype=dtype)
+    chain = itertools.chain.from_iterable
+    words = list(chain(chain(observations)))
+    if len(words) == len(observations) * nsent * nword:
+        # Every sentence padded to the same length, the usual case
+        if lookup is not None:
+            words = map(lookup, words)
+        out[:, :nsent, :nword] = np.fromiter(words, np.int64).reshape(
+            len(observations), nsent, nword)
+        out[:, nsent:] = vocab[""]
+        out[:, :, nword:] = vocab[""]
+        return out
+    out.fill(vocab[""])
+    for b, obs in enumerate(observations):
+        for s, sent in enumerate(obs):
+            out[b, s, :len(sent)] = (sent if lookup is None
+                                     else list(map(lookup, sent)))
+    return out
+
+
+def grid_one_hot_batch(games, observations=None, out=None, dtype=np.float32):
+    '''
+    grid_one_hot for a whole batch: returns the few hot planes of games[i]
+    as out[i], an array of (batch, x, y, nfeatures). observations default to
+    the grids of observing every game. Same requirements as vocabify_batch,
+    grids of different sizes are padded with zeros.
+
+    For the DenseGridMixin featurizers use featurize_batch instead.
+    '''
+    vocab = games[0].vocabulary()
+    coo, shape = _grid_coo(games, _batch_observations(games, observations, 0))
+    if out is None:
+        out = np.zeros(shape + (len(vocab),), dtype=dtype)
+    else:
+        out.fill(0)
+    out[coo] = 1
+    return out
+
+
+def grid_one_hot_sparse_batch(games, observations=None):
+    '''
+    grid_one_hot_sparse for a whole batch: an int64 array of (n, 4) with a
+    (batch, x, y, vocab_i) row for every feature, in that order. This is the
+    COO format, e.g. for torch.sparse_coo_tensor(coo.T, ...).
+    '''
+    coo, _ = _grid_coo(games, _batch_observations(games, observations, 0))
+    return np.stack(coo, axis=1)
+
+
+def grid_packed_batch(games, observations=None):
+    '''
+    grid_one_hot_batch with the features bit packed like
+    encoding.pack_planes, without building the unpacked planes: a uint8
+    array of (batch, x, y, ceil(nfeatures / 8)). Unpack with
+    encoding.unpack_planes(packed, len(vocabulary)).
+    '''
+    vocab = games[0].vocabulary()
+    (b, x, y, t), shape = _grid_coo(
+        games, _batch_observations(games, observations, 0))
+    out = np.zeros(shape + ((len(vocab) + 7) // 8,), dtype=np.uint8)
+    # First feature of a byte in its highest bit, as np.packbits does
+    bits = np.right_shift(128, t & 7).astype(np.uint8)
+    np.bitwise_or.at(out, (b, x, y, t >> 3), bits)
+    return out
+
+
+def _batch_observations(games, observations, part):
+    if observations is None:
+        observations = [game.observe()['observation'] for game in games]
+        if observations and isinstance(observations[0], tuple):
+            observations = [obs[part] for obs in observations]
+    return observations
+
+
+def _grid_coo(games, grids):
+    '''(batch, x, y, vocab_i) index arrays of the features in grids, and
+    the (batch, x, y) shape of the grids padded to the same size. grids
+    may be an iterator, every grid is flattened as it comes, so the nested
+    lists of one grid can be freed before the next is made.'''
+    vocab = games[0].vocabulary()
+    chain = itertools.chain.from_iterable
+    counts, tokens = [], []
+    for grid in grids:
+        tiles = list(chain(grid))
+        counts.append(np.fromiter(map(len, tiles), np.int64, len(tiles))
+                      .reshape(len(grid), len(grid[0]) if grid else 0))
+        tokens.extend(chain(tiles))
+    xm = max([0] + [c.shape[0] for c in counts])
+    ym = max([0] + [c.shape[1] for c in counts])
+    shape = (len(counts), xm, ym)
+    # Pad the features per tile counts with zeros where a grid is smaller
+    if all(c.shape == shape[1:] for c in counts):
+        counts = np.array(counts, dtype=np.int64).reshape(shape)
+    else:
+        padded = np.zeros(shape, dtype=np.int64)
+        for b, c in enumerate(counts):
+            padded[b, :c.shape[0], :c.shape[1]] = c
+        counts = padded
+    if not games[0].featurizer.ids:
+        tokens = map(vocab.ids.__getitem__, tokens)
+    tokens = np.fromiter(tokens, np.int64, counts.sum())
+    # Features were gathered in (batch, x, y) order, so every tile's
+    # features follow each other and the repeated tile indices line up
+    tiles = np.repeat(np.arange(counts.size), counts.ravel())
+    coo = np.unravel_index(tiles, shape) + (tokens,)
+    return coo, shape
@@ -31,9 +31,8 @@ class GoalType(RewardOnEndMixin, WithWaterAndBlocksMixin, BaseVocabulary):
 
 def _est(game, s, e):
     '''shorthand to estimate reward for an agent to move from s to e'''
-    visited, path = creationutils.dijkstra(
-        game, s, creationutils.agent_movefunc, True)
-    return -visited[e]  # Returns distance, which is negation of reward
+    field = game._distance_field(s, weighted=True)
+    return -field.distance(tuple(e))  # Returns distance, which is negation of reward
 
 
 class SingleGoalApproximateRewardMixin(BaseMazeGame):
@@ -49,17 +48,15 @@ class SingleGoal(GoalType):
     def _reset(self):
         super(SingleGoal, self)._reset()
 
-        loc = choice(creationutils.empty_locations(self))
+        loc = creationutils.random_empty_location(self)
         self.goal = mi.Goal(location=loc)
         self._add_item(self.goal)
 
-        loc = choice(creationutils.empty_locations(self, bad_blocks=[mi.Block]))
+        loc = creationutils.random_empty_location(self, bad_blocks=[mi.Block])
         self.agent = MovingAgent(location=loc)
         self._add_agent(self.agent, "SingleGoalAgent")
 
-        visited, _ = creationutils.dijkstra(self, loc,
-                                            creationutils.agent_movefunc)
-        if self.goal.location not in visited:
+        if not self._components().connected(loc, self.goal.location):
             raise MazeException("No path to goal")
 
     def _side_information(self):
@@ -87,20 +84,20 @@ class MultiGoals(GoalType):
 
         self.goals = []
         for i in range(self.n_goals):
-            x, y = choice(creationutils.empty_locations(self))
+            x, y = creationutils.random_empty_location(self)
             self.goals.append(mi.Goal(location=(x, y), id=i))
             self._add_item(self.goals[i])
         shuffle(self.goals)
         self.v = 0
 
-        x, y = choice(creationutils.empty_locations(self,
-                                                    bad_blocks=[mi.Block]))
+        x, y = creationutils.random_empty_location(
+            self, bad_blocks=[mi.Block])
         self.agent = MovingAgent(location=(x, y))
         self._add_agent(self.agent, "MultiGoalsAgent")
 
-        visited, _ = creationutils.dijkstra(self, (x, y),
-                                            creationutils.agent_movefunc)
-        if not all(goal.location in visited for goal in self.goals):
+        components = self._components()
+        if not all(components.connected((x, y), goal.location)
+                   for goal in self.goals):
             raise MazeException("No path to goal")
 
     def _side_information(self):
@@ -142,7 +139,7 @@ class ConditionedGoals(GoalType):
     def _reset(self):
         super(ConditionedGoals, self)._reset()
 
-        x, y = choice(creationutils.empty_locations(self))
+        x, y = creationutils.random_empty_location(self)
         self.sw = mi.Switch(
             location=(x, y),
             nstates=self.n_colors,
@@ -152,21 +149,19 @@ class ConditionedGoals(GoalType):
 
         self.goals = []
         for i in range(self.n_goals):
-            x, y = choice(creationutils.empty_locations(self))
+            x, y = creationutils.random_empty_location(self)
             self.goals.append(mi.Goal(location=(x, y), id=i))
             self._add_item(self.goals[i])
         self.conditions = [randint(0, self.n_goals - 1) for _ in self.goals]
 
-        x, y = choice(creationutils.empty_locations(self,
-                                                    bad_blocks=[mi.Block]))
+        x, y = creationutils.random_empty_location(
+            self, bad_blocks=[mi.Block])
         self.agent = TogglingAgent(location=(x, y))
         self._add_agent(self.agent, "ConditionedGoalsAgent")
 
-        visited, _ = creationutils.dijkstra(self, (x, y),
-                                            creationutils.agent_movefunc)
-
-        if (self.sw.location not in visited or
-            not any(self.goals[i].location in visited
+        components = self._components()
+        if (not components.connected((x, y), self.sw.location) or
+            not any(components.connected((x, y), self.goals[i].location)
                     for i in set(self.conditions))):
             raise MazeException("No path to goal")
 
@@ -217,9 +212,8 @@ class ConditionedGoals(GoalType):
 
     def _accumulate_approximate_rewards(self):
         super(ConditionedGoals, self)._accumulate_approximate_rewards()
-        for x, y in product(range(self.width), range(self.height)):
-            if self._tile_get_block((x, y), mi.Goal) is not None:
-                self._approx_reward_map[x][y] += -self.goal_penalty
+        for x, y in zip(*self._map.occupied(mi.Goal).nonzero()):
+            self._approx_reward_map[x][y] += -self.goal_penalty
 
 
 class Exclusion(GoalType):
@@ -251,19 +245,18 @@ class Exclusion(GoalType):
 
         self.goals = []
         for i in range(self.n_goals):
-            x, y = choice(creationutils.empty_locations(self))
+            x, y = creationutils.random_empty_location(self)
             self.goals.append(mi.Goal(location=(x, y), id=i))
             self._add_item(self.goals[i])
 
-        x, y = choice(creationutils.empty_locations(self,
-                                                    bad_blocks=[mi.Block]))
+        x, y = creationutils.random_empty_location(
+            self, bad_blocks=[mi.Block])
         self.agent = TogglingAgent(location=(x, y))
         self._add_agent(self.agent, "ExclusionAgent")
 
-        visited, _ = creationutils.dijkstra(self, (x, y),
-                                            creationutils.agent_movefunc)
-
-        if not all(goal.location in visited for goal in self.goals):
+        components = self._components()
+        if not all(components.connected((x, y), goal.location)
+                   for goal in self.goals):
             raise MazeException("No path to goal")
 
     def _step(self):
@@ -290,20 +283,11 @@ class Exclusion(GoalType):
         return reward
 
     def _calculate_approximate_reward(self):
-        prev = self.agent.location
-        visited = dict((x, False) for x in self.visit)
-        so_far = 0
-        for _ in self.visit:
-            best_n = None
-            best = -1e100
-            for g in [g for g, b in visited.items() if not b]:
-                t = _est(self, prev, self.goals[g].location)
-                if t > best:
-                    best = t
-                    best_n = g
-            prev = self.goals[best_n].location
-            so_far += best
-            visited[best_n] = True
+        # Best order to visit the goals in, exactly
+        goals = [self.goals[g].location for g in self.visit]
+        start = self._distance_matrix([self.agent.location], goals)[0]
+        so_far = -creationutils.shortest_tour(
+            start, self._distance_matrix(goals, goals))
         return super(Exclusion, self)._calculate_approximate_reward() + so_far
 
     def _accumulate_approximate_rewards(self):
@@ -326,18 +310,16 @@ class Goto(SingleGoalApproximateRewardMixin, GotoType):
     def _reset(self):
         super(Goto, self)._reset()
 
-        loc = choice(creationutils.empty_locations(self))
+        loc = creationutils.random_empty_location(self)
         self.goal = mi.Goal(location=loc, visible=False)
         self._add_item(self.goal)
 
-        loc = choice(creationutils.empty_locations(self,
-                                                   bad_blocks=[mi.Block]))
+        loc = creationutils.random_empty_location(
+            self, bad_blocks=[mi.Block])
         self.agent = MovingAgent(location=loc)
         self._add_agent(self.agent, "GotoAgent")
 
-        visited, _ = creationutils.dijkstra(self, loc,
-                                            creationutils.agent_movefunc)
-        if self.goal.location not in visited:
+        if not self._components().connected(loc, self.goal.location):
             raise MazeException("No path to goal")
 
     def _side_information(self):
@@ -365,20 +347,18 @@ class GotoHidden(SingleGoalApproximateRewardMixin, GotoType):
 
         self.goals = []
         for i in range(self.n_goals):
-            x, y = choice(creationutils.empty_locations(self))
+            x, y = creationutils.random_empty_location(self)
             self.goals.append(mi.Goal(location=(x, y), id=i, visible=False))
             self._add_item(self.goals[i])
 
         self.goal = choice(self.goals)
 
-        x, y = choice(creationutils.empty_locations(self,
-                                                    bad_blocks=[mi.Block]))
+        x, y = creationutils.random_empty_location(
+            self, bad_blocks=[mi.Block])
         self.agent = MovingAgent(location=(x, y))
         self._add_agent(self.agent, "GotoHiddenAgent")
 
-        visited, _ = creationutils.dijkstra(self, (x, y),
-                                            creationutils.agent_movefunc)
-        if self.goal.location not in visited:
+        if not self._components().connected((x, y), self.goal.location):
             raise MazeException("No path to goal")
 
     def _side_information(self):
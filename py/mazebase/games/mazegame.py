@@ -3,20 +3,44 @@ from __future__ import division
 from __future__ import unicode_literals
 from __future__ import print_function
 import abc
+import copy
 import logging
 import random
 import six
+import types
 import uuid
+import numpy as np
 from collections import OrderedDict
-from itertools import chain, product
+from itertools import chain
 
 from mazebase.games import featurizers
 from mazebase.termcolor import cprint
 from mazebase.utils import creationutils
+from mazebase.utils.tilemap import TileMap
+from mazebase.utils.vocabulary import Vocabulary
 import mazebase.utils.mazeutils as mazeutils
 import mazebase.items as mi
 import mazebase.items.agents as agents
 
+# Values fork() doesn't have to look into
+_SCALARS = six.string_types + six.integer_types + (float, bool, type(None))
+# Attributes fork() copies itself
+_FORK_SPECIAL = ('_map', '_distance_fields', '_distance_matrices',
+                 '_approx_reward_map', '_actions', '_featurizer_cache',
+                 '_component_cache', '_items')
+
+
+def _rebind(value, old, new):
+    # Methods set on the instance old, like those CurriculumWrappedGame puts
+    # on a game, bound to new instead. Anything else as it is
+    if isinstance(value, types.MethodType) and value.__self__ is old:
+        return types.MethodType(value.__func__, new)
+    return value
+
+
+def _noop():
+    logging.debug("Action isn't supported! Passing instead")
+
 
 class MazeGame(object):
     '''
@@ -35,11 +59,14 @@ class MazeGame(object):
         self.__max_bounds = (max(max_w), max(max_h))
 
         # Overwrite the featurizer with our current one
-        for game in self.games:
-            game._set_featurizer(self.featurizer)
+        self._set_featurizer(self.featurizer)
         self.reset()
 
     def __getattr__(self, name):
+        # Copying looks up dunders like __setstate__ before there is a
+        # self.game, which must not recurse into looking for self.game
+        if name == 'game' or name.startswith('__'):
+            raise AttributeError(name)
         return getattr(self.game, name)
 
     def all_possible_features(self):
@@ -61,6 +88,51 @@ class MazeGame(object):
         self.game = random.choice(self.games)
         self.game.reset()
 
+    def _set_featurizer(self, featurizer):
+        self.featurizer = featurizer
+        for game in self.games:
+            game._set_featurizer(featurizer)
+        # All games share a vocabulary, so their token ids agree
+        self._set_vocabulary(Vocabulary(self.all_possible_features()))
+
+    def _set_vocabulary(self, vocab):
+        self.__vocabulary = vocab
+        for game in self.games:
+            game._set_vocabulary(vocab)
+
+    def vocabulary(self):
+        return self.__vocabulary
+
+    def _set_stats(self, stats):
+        for game in self.games:
+            game._set_stats(stats)
+
+    def fork(self):
+        '''Forks the game being played, see BaseMazeGame.fork. The other
+        games are shared with the fork, so don't reset it.'''
+        # Not copy.copy, so methods set on the instance are bound to the
+        # fork, like BaseMazeGame.fork does
+        other = self.__class__.__new__(self.__class__)
+        other.__dict__.update((k, _rebind(v, self, other))
+                              for k, v in self.__dict__.items())
+        other.game = self.game.fork()
+        other.games = [other.game if game is self.game else game
+                       for game in self.games]
+        return other
+
+    def snapshot(self):
+        return self.game.snapshot()
+
+    def restore(self, snapshot):
+        # The snapshot may be of another game than the current one
+        for game in self.games:
+            if type(game) is type(snapshot) and \
+                    game.game_name == snapshot.game_name:
+                game.restore(snapshot)
+                self.game = game
+                return
+        raise ValueError("Snapshot isn't of any of the games")
+
     @classmethod
     def all_features(cls):
         return []
@@ -73,6 +145,8 @@ class BaseMazeGame(object):
         observe()   Returns the current observation
         is_over()   Whether the game is in a terminal state.
         act(action) Performs action, which must be in actions()
+        act_index(i)    Performs all_possible_actions()[i], for policies
+                        that output indices
         reward()    Reward experienced by last action
         reward_so_far()     Reward during current episode
         approx_best_reward()    Approximation of optimal reward
@@ -80,6 +154,7 @@ class BaseMazeGame(object):
         reset()     Gives a random game initialization
         display()   Simply prints a visualization of the game
         actions()   Currently allowed actions for current agent
+        action_ids()    Same, as indices into all_possible_actions()
         current_agent()     Returns current agent that is acting
 
     Some functions to do with game properties
@@ -98,7 +173,7 @@ class BaseMazeGame(object):
             _side_information()  Game specific info features
         To support approximating reward:
             _accumulate_approximate_rewards()  Fills game._approx_reward_map
-            _calculate_approximate_reward()  Called once per reset()
+            _calculate_approximate_reward()  Called at most once per reset()
         Other functionality:
             _step()  hook called after every act().
 
@@ -110,6 +185,8 @@ class BaseMazeGame(object):
         featurizer=featurizers.SentenceFeaturesRelative(bounds=5),
         map_size=(5, 10, 5, 10),  # (min_x, max_x, min_y, max_y)
         turn_penalty=0.1,
+        approximate_reward='lazy',
+        stats=None,
     )
 
     def __init__(self, **kwargs):
@@ -117,11 +194,21 @@ class BaseMazeGame(object):
         kwargs:
             featurizer: featurizer to use when doing observe()
             map_size: (x_min, x_max, y_min, y_max), draw uniformly and randomly
+            approximate_reward: when to compute approx_best_reward(),
+                'eager' in reset(), 'lazy' on first call, None never
+            stats: mazebase.utils.stats.Stats to record call counts and
+                times in, see also collect_stats
         '''
         mazeutils.populate_kwargs(self, self.__class__.__properties, kwargs)
         super(BaseMazeGame, self).__init__()
         self.game_name = uuid.uuid4().hex
         self.__all_possible_features = None
+        self.__vocabulary = None
+        # Integer action space, extended by _add_agent if an agent has
+        # actions all_possible_actions() doesn't know about
+        self._action_space = self.all_possible_actions()
+        self._action_ids = dict((b, a) for a, b in
+                                enumerate(self._action_space))
         self.__reward = 0
         self.reset()
 
@@ -135,7 +222,8 @@ class BaseMazeGame(object):
         for y in reversed(range(self.height)):
             cprint('   ', None, 'on_white', end="")
             for x in range(self.width):
-                itemlst = sorted(filter(lambda x: x.visible, self._map[x][y]),
+                itemlst = sorted(filter(lambda x: x.visible,
+                                        self._map.at(x, y)),
                                  key=lambda x: x.PRIO)
                 disp = [u'   ', None, None, None]
                 for item in itemlst:
@@ -182,8 +270,30 @@ class BaseMazeGame(object):
         return self.__reward_so_far
 
     def approx_best_reward(self):
+        '''
+        Approximation of the best reward possible this episode. Depending on
+        the approximate_reward option, this is computed in reset() ('eager'),
+        on the first call ('lazy'), or never (None, and this returns None).
+        Either way it is made from the state the episode starts in: with
+        'lazy', the first act() forks that state to compute it from later.
+        '''
+        if self.__approx_best is None and self.__start is not None:
+            # Memoized in the fork, which forks of this game share
+            self.__approx_best = self.__start.approx_best_reward()
+            self.__start = None
+        elif self.__approx_best is None and self.approximate_reward:
+            if self.stats is not None:
+                with self.stats.timer('approx_reward'):
+                    self.__approximate_reward()
+            else:
+                self.__approximate_reward()
         return self.__approx_best
 
+    def __approximate_reward(self):
+        self._accumulate_approximate_rewards()
+        self._invalidate_distance_fields()
+        self.__approx_best = self._calculate_approximate_reward()
+
     def reset(self):
         '''
         Wrapper to try 100 times, since sometimes the random generation
@@ -191,6 +301,21 @@ class BaseMazeGame(object):
         Override _reset when creating a new game. Reset logic is in here
         so every subclass has access to reset variables correctly.
         '''
+        if self.stats is not None:
+            searches = self.__searches()
+            with self.stats.timer('reset'):
+                self.__reset()
+            self.stats.count('reset.searches',
+                             self.__searches() - searches)
+        else:
+            self.__reset()
+
+    def __searches(self):
+        calls = self.stats.calls
+        return sum(calls.get(name, 0)
+                   for name in ('dijkstra', 'distance_field', 'components'))
+
+    def __reset(self):
         for i in range(100):
             try:
                 self.uid = 0
@@ -201,19 +326,24 @@ class BaseMazeGame(object):
                 # Agents and their current speed.
                 # An agent moves when it reaches 0 speed
                 self._agents = OrderedDict()
-                # All actions available. (agent_id, action_id): function
+                # All actions available. agent_id: {action index: function}
                 self._actions = {}
+                # agent_id: (sorted action names, array of their indices)
+                self._agent_actions = {}
 
                 min_x, max_x, min_y, max_y = self.map_size
                 self.width = random.randint(min_x, max_x)
                 self.height = random.randint(min_y, max_y)
-                self._map = [[[] for x in range(self.height)]
-                             for y in range(self.width)]
+                self._map = TileMap(self.width, self.height)
 
                 # For estimating best possible reward
                 self._approx_reward_map = [[-self.turn_penalty
                                            for x in range(self.height)]
                                           for y in range(self.width)]
+                self._invalidate_distance_fields()
+                self._component_cache = {}
+                # Featurizers keep what they need between calls here
+                self._featurizer_cache = {}
                 self.__reward_history = dict()
                 self.__reward_so_far = 0
 
@@ -226,8 +356,10 @@ class BaseMazeGame(object):
                 for loc in cornerlocs:
                     self._add_item(mi.Corner(location=loc))
                 self._step()
-                self._accumulate_approximate_rewards()
-                self.__approx_best = self._calculate_approximate_reward()
+                self.__approx_best = None
+                self.__start = None
+                if self.approximate_reward == 'eager':
+                    self.approx_best_reward()
 
                 if self._finished():
                     actor = self.current_agent()
@@ -236,14 +368,28 @@ class BaseMazeGame(object):
                         actor, 0) + self.__reward
                     self.__reward_so_far = self.__reward_history[actor]
                 return
-            except mazeutils.MazeException:
+            except mazeutils.MazeException as e:
                 logging.exception("Failed to create map because: ")
+                if self.stats is not None:
+                    self.stats.count('reset.retry.' +
+                                     (str(e) or type(e).__name__))
         raise RuntimeError("Failed to create map after 100 tries! Your map"
                            "size is probably too small")
 
     def _set_featurizer(self, featurizer):
         '''Helper function for wrappers'''
         self.featurizer = featurizer
+        # The featurizer adds its own features
+        self.__all_possible_features = None
+        self.__vocabulary = None
+
+    def _set_vocabulary(self, vocab):
+        '''Helper function for wrappers, to share a vocabulary'''
+        self.__vocabulary = vocab
+
+    def _set_stats(self, stats):
+        '''Helper function for wrappers and collect_stats'''
+        self.stats = stats
 
     def get_max_bounds(self):
         '''Get maximum width and height across all random initializations'''
@@ -281,36 +427,200 @@ class BaseMazeGame(object):
         '''
         return 0
 
+    def _distance_field(self, source, movefunc=None, weighted=False):
+        '''
+        Cached creationutils.DistanceField from source, so all reward
+        estimates share one search per source. movefunc defaults to
+        agent_movefunc. Fields are dropped whenever an item is added, moved
+        or removed. Call _invalidate_distance_fields() after changing
+        _approx_reward_map.
+        '''
+        if self._distance_fields_version != self._map.version:
+            self._invalidate_distance_fields()
+        movefunc = movefunc or creationutils.agent_movefunc
+        key = (tuple(source), movefunc, weighted)
+        if key not in self._distance_fields:
+            self._distance_fields[key] = creationutils.DistanceField(
+                self, key[0], movefunc, weighted)
+        return self._distance_fields[key]
+
+    def _components(self, blocking=mi.Block):
+        '''
+        creationutils.Components of the current map, to ask whether tiles
+        can reach each other. It follows the map as items are added, moved
+        and removed, so keep asking the game for it rather than holding on.
+        '''
+        components = self._component_cache.get(blocking)
+        if components is None or components.map is not self._map:
+            components = creationutils.Components(
+                self._map, blocking, stats=self.stats)
+            self._component_cache[blocking] = components
+        return components
+
+    def _distance_matrix(self, sources, targets, weighted=True):
+        '''
+        Array of the agent_movefunc distances from every location of sources
+        to every location of targets, read from the _distance_field of each
+        source. Cached and dropped along with the fields.
+        '''
+        if self._distance_fields_version != self._map.version:
+            self._invalidate_distance_fields()
+        key = (tuple(tuple(loc) for loc in sources),
+               tuple(tuple(loc) for loc in targets), weighted)
+        if key not in self._distance_matrices:
+            rewards = self._approx_reward_map
+            found = {}
+            for source in key[0]:
+                for target in key[1]:
+                    if (target, source) in found and not (
+                            self._tile_has(source, mi.Block) or
+                            self._tile_has(target, mi.Block)):
+                        # Moves between free tiles can be undone, so the
+                        # way back is the same path, only entering source
+                        # instead of target
+                        distance = found[target, source]
+                        if weighted:
+                            distance += rewards[source[0]][source[1]] - \
+                                rewards[target[0]][target[1]]
+                    else:
+                        distance = self._distance_field(
+                            source, weighted=weighted).distance(target)
+                    found[source, target] = distance
+            self._distance_matrices[key] = np.array(
+                [[found[source, target] for target in key[1]]
+                 for source in key[0]],
+                dtype=np.float64).reshape(len(key[0]), len(key[1]))
+        return self._distance_matrices[key]
+
+    def _invalidate_distance_fields(self):
+        self._distance_fields = {}
+        self._distance_matrices = {}
+        self._distance_fields_version = self._map.version
+
     def _in_bounds(self, location):
         # Checks whether a location is in the maze
         x, y = location
         return 0 <= x < self.width and 0 <= y < self.height
 
     def _tile_get_block(self, loc, typ):
-        for block in self._get_items(loc):
-            if isinstance(block, typ):
-                return block
-        return None
+        # First item of type typ at loc, or None
+        x, y = loc
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        return self._map.find(x, y, typ)
+
+    def _tile_has(self, loc, typ):
+        # Whether there is an item of type typ at loc
+        x, y = loc
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return False
+        return self._map.has(x, y, typ)
 
     def _featurize(self, id):
+        if self.stats is not None:
+            with self.stats.timer('featurize'):
+                return self.featurizer.featurize(self, id)
         return self.featurizer.featurize(self, id)
 
     def _side_info(self):
-        '''Override _side_information instead'''
-        info = self._side_information()
-        for lst in info:
-            lst.insert(0, 'INFO')
-        return info
+        '''Override _side_information instead. Computed once per reset,
+        returns a copy'''
+        cache = self._featurizer_cache.setdefault('side_info', {})
+        if None not in cache:
+            info = self._side_information()
+            for lst in info:
+                lst.insert(0, 'INFO')
+            cache[None] = info
+        return [list(lst) for lst in cache[None]]
+
+    def _invalidate_side_info(self):
+        '''Call when _side_information() changes during an episode. Side
+        info, and the featurizers' padded and encoded versions of it, are
+        otherwise only computed once per reset()'''
+        self._featurizer_cache.pop('side_info', None)
 
     def _side_information(self):
         '''Side information about the game. Shouldn't change too much and
         and encode information about the goals of the game. This list is
         _ordered_, with the information from the superclasses appearing first.
+        It is cached until the next reset, see _invalidate_side_info().
 
         This is the equivalent of info from mazebase1.0
         '''
         return [['GAME', type(self).__name__]]
 
+    ####################
+    # State functions
+    ####################
+
+    def fork(self):
+        '''
+        Returns an independent copy of the game in its current state, for
+        tree search and the like. This is much cheaper than deepcopy: items
+        that never change (MazeItem.MUTABLE is False) are shared between the
+        copies, only the other items and the map arrays are copied.
+        '''
+        other = self.__class__.__new__(self.__class__)
+        other.__dict__.update(self.__forked_state(other))
+        return other
+
+    def snapshot(self):
+        '''Copy of the current state to pass to restore(). Treat it as
+        opaque, it can be restored any number of times.'''
+        return self.fork()
+
+    def restore(self, snapshot):
+        '''Puts the game back in the state snapshot() was called in'''
+        state = snapshot.__forked_state(self)
+        self.__dict__.clear()
+        self.__dict__.update(state)
+
+    def __forked_state(self, owner):
+        # __dict__ for owner, with copies of the mutable items and of every
+        # container that may refer to them or change during an episode
+        clones = {}
+        for item in self._items.values():
+            if item.MUTABLE:
+                clone = copy.copy(item)
+                clone.game = owner
+                clones[id(item)] = clone
+
+        def remap(value):
+            # Items that aren't cloned are shared, like any other value
+            clone = clones.get(id(value))
+            if clone is not None:
+                return clone
+            if isinstance(value, _SCALARS):
+                return value
+            if isinstance(value, types.MethodType):
+                return _rebind(value, self, owner)
+            if isinstance(value, (list, tuple, set)):
+                return type(value)(remap(v) for v in value)
+            if isinstance(value, dict):
+                res = copy.copy(value)
+                for k, v in value.items():
+                    res[k] = remap(v)
+                return res
+            return value
+
+        state = dict((k, remap(v)) for k, v in self.__dict__.items()
+                     if k not in _FORK_SPECIAL)
+        state['_items'] = dict((k, clones.get(id(item), item))
+                               for k, item in self._items.items())
+        state['_approx_reward_map'] = [
+            list(col) for col in self._approx_reward_map]
+        state['_map'] = self._map.copy(dict(
+            (clone.handle, clone) for clone in clones.values()))
+        state['_actions'] = dict(
+            (agent, dict((i, state['_items'][agent].actions[
+                self._action_space[i]]) for i in funcs))
+            for agent, funcs in self._actions.items())
+        state['_distance_fields'] = {}
+        state['_distance_matrices'] = {}
+        state['_featurizer_cache'] = {}
+        state['_component_cache'] = {}
+        return state
+
     ####################
     # Item functions
     ####################
@@ -328,10 +638,21 @@ class BaseMazeGame(object):
         for mod in modules:
             for name, cls in mazeutils.all_classes_of(mod):
                 features.update(cls.all_features())
+        # Games defined outside of mazebase.games
+        features.update(type(self).all_features())
         features.update(self.featurizer.all_possible_features(self))
         self.__all_possible_features = list(sorted(features))
         return self.__all_possible_features
 
+    def vocabulary(self):
+        '''
+        Vocabulary of all_possible_features(), to map features to token ids
+        and back. Featurizers created with ids=True output these ids.
+        '''
+        if self.__vocabulary is None:
+            self.__vocabulary = Vocabulary(self.all_possible_features())
+        return self.__vocabulary
+
     @classmethod
     def all_features(cls):
         '''
@@ -342,11 +663,11 @@ class BaseMazeGame(object):
         return ['GAME', 'INFO', cls.__name__, '']
 
     def _get_items(self, location):
-        # Get item list at a location in the maze, empty if out of buonds
+        # Get items at a location in the maze, empty if out of buonds
         x, y = location
         if not self._in_bounds(location):
             return []
-        return self._map[x][y]
+        return self._map.at(x, y)
 
     def _add_item(self, item, id=None):
         assert id is None or isinstance(id, six.string_types) or '|' in id,\
@@ -358,45 +679,74 @@ class BaseMazeGame(object):
 
         item.game = self
         item.id = id
-
-        x, y = item.location
-        self._map[x][y].append(item)
+        item.handle = self._map.add(item)
         return id
 
+    def _add_items(self, items):
+        '''Adds many items with generated ids at once, cheaper than
+        _add_item for each. Returns their ids'''
+        ids = []
+        for item in items:
+            self.uid += 1
+            id = self.game_name + '|' + str(self.uid) + '|'
+            assert id not in self._items, \
+                "Item {0} already in map...".format(id)
+            self._items[id] = item
+            item.game = self
+            item.id = id
+            ids.append(id)
+        for item, handle in zip(items, self._map.add_many(items)):
+            item.handle = handle
+        return ids
+
     def _move_item(self, id, location):
         nx, ny = location
         if not self._in_bounds(location):
             return
         item = self._items[id]
-        x, y = item.location
-        self._map[x][y].remove(item)
-        self._map[nx][ny].append(item)
+        self._map.move(item.handle, location)
         item.location = (nx, ny)
 
     def _remove_item(self, id):
         item = self._items[id]
-        x, y = item.location
-        self._map[x][y].remove(item)
+        self._map.remove(item.handle)
         self._items.pop(id)
 
+    def _item_changed(self, id):
+        '''Marks the tile of item id as changed, see MazeItem._changed()'''
+        item = self._items.get(id)
+        if item is not None:
+            self._map.touch(*item.location)
+
     ####################
     # Agent functions
     ####################
 
+    __all_actions = None
+
     @staticmethod
     def all_possible_actions():
         '''
         Returns all possible actions an agent can take
         '''
-        actions = set()
-        for name, cls in mazeutils.all_classes_of(agents):
-            actions.update(cls().actions.keys())
-        return list(sorted(actions))
+        if BaseMazeGame.__all_actions is None:
+            actions = set()
+            for name, cls in mazeutils.all_classes_of(agents):
+                actions.update(cls().actions.keys())
+            BaseMazeGame.__all_actions = sorted(actions)
+        return list(BaseMazeGame.__all_actions)
 
     def actions(self):
         ''' All possible actions for current agent '''
-        return sorted([action for agent, action in self._actions.keys()
-                if agent == self.current_agent()])
+        return list(self._agent_actions[self.current_agent()][0])
+
+    def action_ids(self):
+        '''
+        Indices of actions() in all_possible_actions(), as a read only int
+        array. It is the same array for every call, don't hold on to it
+        across resets.
+        '''
+        return self._agent_actions[self.current_agent()][1]
 
     def current_agent(self):
         '''
@@ -417,19 +767,43 @@ class BaseMazeGame(object):
 
     def act(self, action):
         ''' Performs an action for current agent '''
+        self.act_index(self._action_ids.get(action))
+
+    def act_index(self, index):
+        '''
+        Performs all_possible_actions()[index] for current agent. Indices
+        don't change for the lifetime of the game.
+        '''
+        if self.stats is not None:
+            with self.stats.timer('act'):
+                self.__act_index(index)
+        else:
+            self.__act_index(index)
+
+    def __act_index(self, index):
+        if self.__approx_best is None and self.__start is None and \
+                self.approximate_reward == 'lazy':
+            # Keep the start state around for approx_best_reward()
+            self.__start = self.fork()
         self._acting = None
         if self._finished():
             return
         actor = self.current_agent()
 
         # Do nothing if action isn't supported
-        def noop():
-            logging.debug("Action isn't supported! Passing instead")
-        self._actions.get((actor, action), noop)()
-        self._step()
+        self._actions[actor].get(index, _noop)()
+        if self.stats is not None:
+            with self.stats.timer('step_hook'):
+                self._step()
+        else:
+            self._step()
         self._agents[actor] = self._items[actor].speed
 
-        self.__reward = self._get_reward(actor)
+        if self.stats is not None:
+            with self.stats.timer('reward'):
+                self.__reward = self._get_reward(actor)
+        else:
+            self.__reward = self._get_reward(actor)
         self.__reward_history[actor] = self.__reward_history.get(actor, 0) + \
             self.__reward
         self.__reward_so_far = self.__reward_history[actor]
@@ -442,8 +816,16 @@ class BaseMazeGame(object):
         assert id is not None, "Agent must have an id"
         id = self._add_item(agent, id)
         self._agents[id] = agent.speed
-        self._actions.update(dict(((id, k), v) for
-                                  k, v in agent.actions.items()))
+        for action in agent.actions:
+            if action not in self._action_ids:
+                self._action_ids[action] = len(self._action_space)
+                self._action_space.append(action)
+        self._actions[id] = dict((self._action_ids[k], v) for
+                                 k, v in agent.actions.items())
+        names = sorted(agent.actions)
+        ids = np.array([self._action_ids[k] for k in names], dtype=np.int64)
+        ids.flags.writeable = False
+        self._agent_actions[id] = (names, ids)
         return id
 
     def _step(self):
@@ -452,11 +834,18 @@ class BaseMazeGame(object):
 
 
 class WithWaterAndBlocksMixin(BaseMazeGame):
-    ''' Subcassing this game will generate random blocks and water '''
+    ''' Subcassing this game will generate random blocks and water.
+
+    With connected, blocks that cut off part of the map are taken out
+    again, so every tile without a block can be reached from every other,
+    see creationutils.connect. Items placed on such tiles afterwards are
+    reachable by construction, instead of resetting until they are.
+    '''
     __properties = dict(
         waterpct=0.1,
         blockpct=0.1,
         water_penalty=0.2,
+        connected=True,
     )
 
     def __init__(self, **kwargs):
@@ -465,20 +854,21 @@ class WithWaterAndBlocksMixin(BaseMazeGame):
 
     def _reset(self):
         super(WithWaterAndBlocksMixin, self)._reset()
-        creationutils.sprinkle(self, [(mi.Block, self.blockpct),
-                                      (mi.Water, self.waterpct)])
+        ids = creationutils.sprinkle(self, [(mi.Block, self.blockpct),
+                                            (mi.Water, self.waterpct)])
+        if self.connected:
+            creationutils.connect(self, ids)
 
     def _get_reward(self, id):
         reward = super(WithWaterAndBlocksMixin, self)._get_reward(id)
-        if self._tile_get_block(self._items[id].location, mi.Water) is not None:
+        if self._tile_has(self._items[id].location, mi.Water):
             reward += -self.water_penalty
         return reward
 
     def _accumulate_approximate_rewards(self):
         super(WithWaterAndBlocksMixin, self)._accumulate_approximate_rewards()
-        for x, y in product(range(self.width), range(self.height)):
-            if self._tile_get_block((x, y), mi.Water) is not None:
-                self._approx_reward_map[x][y] += -self.water_penalty
+        for x, y in zip(*self._map.occupied(mi.Water).nonzero()):
+            self._approx_reward_map[x][y] += -self.water_penalty
 
 
 class RewardOnEndMixin(BaseMazeGame):
@@ -553,7 +943,7 @@ class BaseVocabulary(BaseMazeGame):
 class AbsoluteLocationVocabulary(mazeutils.AbsoluteLocationUtils, BaseMazeGame):
     '''Featurizer uses absolute locations'''
     def all_possible_features(self):
-        return list(sorted(chain(
+        return list(sorted(set(chain(
             super(AbsoluteLocationVocabulary, self).all_possible_features(),
             self._get_abs_loc_features(self)
-        )))
+        ))))
@@ -0,0 +1,106 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+import copy
+import threading
+from six.moves import queue
+
+
+class PrefetchingGame(object):
+    '''
+    Keeps prefetch freshly reset games ready, generated by background
+    threads, so reset() only has to swap in the next one instead of building
+    a map on the spot. Check BaseMazeGame for list of usable functions. Like
+    MazeGame, this secretly "inherits" from the game it is playing.
+
+    Every ready state is a separate copy of the game, so self.game changes on
+    every reset(). Don't hold on to items or the game across resets.
+
+    Args:
+        game: game to play, copied with deepcopy. Can also be a function
+            returning a new game, for games that can't be deep copied.
+        prefetch: number of initial states to keep ready
+        workers: number of threads generating them
+
+    Generation happens in threads, so it overlaps with whatever the acting
+    loop does without the GIL (sleeping, waiting on a model, numpy). Games
+    with an approximate_reward option have approx_best_reward() computed
+    there as well, even 'lazy' ones. Call close() to stop the threads.
+    '''
+
+    def __init__(self, game, prefetch=4, workers=1):
+        if callable(game):
+            copies = [game() for _ in range(prefetch + 1)]
+        else:
+            copies = [game] + [copy.deepcopy(game) for _ in range(prefetch)]
+        self.prefetch = prefetch
+        self.game = copies[0]
+        self.__copies = copies
+        self.__free = queue.Queue()
+        self.__ready = queue.Queue()
+        for game in copies[1:]:
+            self.__free.put(game)
+
+        self.__workers = [threading.Thread(target=self.__work)
+                          for _ in range(workers)]
+        for worker in self.__workers:
+            worker.daemon = True
+            worker.start()
+
+    def __getattr__(self, name):
+        # Like MazeGame, don't recurse while there is no self.game yet
+        if name == 'game' or name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.game, name)
+
+    @classmethod
+    def all_features(cls):
+        return []
+
+    def reset(self):
+        '''Swaps in the next ready game, and hands the current one to the
+        workers to reset in the background'''
+        game, error = self.__ready.get()
+        if error is not None:
+            self.__free.put(game)
+            raise error
+        self.__free.put(self.game)
+        self.game = game
+
+    def close(self):
+        '''Stops the worker threads'''
+        for _ in self.__workers:
+            self.__free.put(None)
+        for worker in self.__workers:
+            worker.join()
+        self.__workers = []
+
+    def _set_featurizer(self, featurizer):
+        for game in self.__copies:
+            game._set_featurizer(featurizer)
+
+    def _set_vocabulary(self, vocab):
+        for game in self.__copies:
+            game._set_vocabulary(vocab)
+
+    def _set_stats(self, stats):
+        # The workers record their resets into the same stats. Counts can
+        # be slightly off, as updates from different threads may race
+        for game in self.__copies:
+            game._set_stats(stats)
+
+    def __work(self):
+        while True:
+            game = self.__free.get()
+            if game is None:
+                return
+            try:
+                game.reset()
+                if game.approximate_reward:
+                    # Here, instead of on the acting thread when asked
+                    # for, or forking the start state on the first act()
+                    game.approx_best_reward()
+                self.__ready.put((game, None))
+            except Exception as e:
+                self.__ready.put((game, e))
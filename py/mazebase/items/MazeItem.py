@@ -16,7 +16,11 @@ class MazeItem(object):
     PRIO determines priority of visibility when viewing the object,
         and has no effect on the game. A higher priority object is always
         diplayed first
+    MUTABLE must be True for items that change after they are added to the
+        game, by moving or changing state. Other items are shared between
+        copies made by BaseMazeGame.fork()
     '''
+    MUTABLE = False
 
     __properties = dict(
         location=(0, 0),
@@ -28,6 +32,8 @@ class MazeItem(object):
         populate_kwargs(self, self.__class__.__properties, kwargs)
 
         self.game = None
+        # Set by the game's TileMap when the item is added
+        self.handle = None
         self.PRIO = 0
 
     def _get_display_symbol(self):
@@ -41,6 +47,12 @@ class MazeItem(object):
         '''
         return (None, None, None, None)
 
+    def _changed(self):
+        '''Call when featurize() changes while the item stays put, like a
+        switch toggling, so featurizers know to redraw its tile'''
+        if self.game is not None:
+            self.game._item_changed(self.id)
+
     def clone(self):
         return deepcopy(self)
 
@@ -48,6 +60,37 @@ class MazeItem(object):
         ''' Return a list of the features for this item '''
         return [type(self).__name__]
 
+    def featurize_ids(self, vocab):
+        '''
+        featurize() as token ids of vocab, a Vocabulary. Items that
+        implement featurize() are encoded from it, unless they implement
+        this as well, which avoids building strings. Subclasses of those
+        have to implement both or neither.
+        '''
+        cls = type(self)
+        ids = vocab.cached((MazeItem.featurize_ids, cls), lambda: None
+                           if cls.class_features() is None
+                           else vocab.encode(cls.class_features()))
+        if ids is None:
+            return vocab.encode(self.featurize())
+        return list(ids)
+
+    def _class_ids(self, vocab):
+        # Ids of MazeItem.featurize(), for featurize_ids() to add to
+        return list(vocab.cached((MazeItem, type(self)), lambda: vocab.encode(
+            MazeItem.featurize(self))))
+
+    @classmethod
+    def class_features(cls):
+        '''
+        Features of every item of this class, or None if featurize() depends
+        on the item. Lets featurizers handle all items of a class at once.
+        '''
+        if six.get_unbound_function(cls.featurize) is \
+                six.get_unbound_function(MazeItem.featurize):
+            return [cls.__name__]
+        return None
+
     @classmethod
     def all_features(cls):
         '''
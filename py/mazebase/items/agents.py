@@ -4,6 +4,8 @@ from __future__ import print_function
 from __future__ import unicode_literals
 from random import choice
 import sys
+import types
+import six
 
 from mazebase.utils import mazeutils
 import mazebase.items as mi
@@ -29,6 +31,7 @@ class Agent(mi.MazeItem):
         # Speed allows some agents to move faster than others
         speed=1
     )
+    MUTABLE = True
 
     def __init__(self, **kwargs):
         mazeutils.populate_kwargs(self, self.__class__.__properties, kwargs)
@@ -39,6 +42,16 @@ class Agent(mi.MazeItem):
         self._all_agents = [x[1] for x in
                             mazeutils.all_classes_of(sys.modules[__name__])]
 
+    def __copy__(self):
+        # Actions are bound methods, they have to be bound to the copy
+        other = self.__class__.__new__(self.__class__)
+        other.__dict__.update(self.__dict__)
+        other.actions = dict(
+            (k, types.MethodType(f.__func__, other)
+             if getattr(f, '__self__', None) is self else f)
+            for k, f in self.actions.items())
+        return other
+
     def _pass(self):
         pass
 
@@ -47,15 +60,36 @@ class Agent(mi.MazeItem):
         self.actions[id] = func
 
     def featurize(self):
-        features = list(set(self.__get_all_superclasses(self.__class__)))
+        features = list(set(self.__get_all_superclasses(self.__class__,
+                                                         self._all_agents)))
         return features
 
-    def __get_all_superclasses(self, cls):
+    def featurize_ids(self, vocab):
+        # Only depends on the class, unless a subclass changes featurize()
+        ids = vocab.cached((Agent, type(self)), lambda: None
+                           if type(self).class_features() is None
+                           else vocab.encode(self.featurize()))
+        if ids is None:
+            return vocab.encode(self.featurize())
+        return list(ids)
+
+    @classmethod
+    def class_features(cls):
+        if six.get_unbound_function(cls.featurize) is not \
+                six.get_unbound_function(Agent.featurize):
+            return None
+        all_agents = [x[1] for x in
+                      mazeutils.all_classes_of(sys.modules[__name__])]
+        return list(set(Agent.__get_all_superclasses(cls, all_agents)))
+
+    @staticmethod
+    def __get_all_superclasses(cls, all_agents):
         all_superclasses = []
         for superclass in cls.__bases__:
-            if superclass in self._all_agents:
+            if superclass in all_agents:
                 all_superclasses.append(superclass.__name__)
-            all_superclasses.extend(self.__get_all_superclasses(superclass))
+            all_superclasses.extend(
+                Agent.__get_all_superclasses(superclass, all_agents))
         return all_superclasses
 
     def _get_display_symbol(self):
@@ -82,9 +116,8 @@ class SingleTileMovable(Agent):
         x, y = self.location
         nloc = x + dx, y + dy
         # Cannot walk into blocks, agents, or closed doors
-        if (self.game._tile_get_block(nloc, mi.Block) is None and
-                self.game._tile_get_block(nloc, Agent) is None and
-                (not self.game._tile_get_block(nloc, mi.Door) or
+        if (not self.game._tile_has(nloc, (mi.Block, Agent)) and
+                (not self.game._tile_has(nloc, mi.Door) or
                  self.game._tile_get_block(nloc, mi.Door).isopen)):
             self.game._move_item(self.id, location=nloc)
 
@@ -108,7 +141,7 @@ class BreadcrumbDropping(Agent):
         self._add_action("breadcrumb", self.__drop_crumb)
 
     def __drop_crumb(self):
-        if self.game._tile_get_block(self.location, mi.Breadcrumb) is None:
+        if not self.game._tile_has(self.location, mi.Breadcrumb):
             self.game._add_item(mi.Breadcrumb(location=self.location))
 
 
@@ -132,8 +165,7 @@ class Pushing(Agent):
         # Cannot push into other blocks or agents
         block = self.game._tile_get_block((tx, ty), mi.Pushable)
         if (block is not None and
-                self.game._tile_get_block((nx, ny), Agent) is None and
-                self.game._tile_get_block((nx, ny), mi.Block) is None):
+                not self.game._tile_has((nx, ny), (mi.Block, Agent))):
             self.game._move_item(block.id, location=(nx, ny))
 
     def __push_up(self):
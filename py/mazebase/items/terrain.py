@@ -9,6 +9,10 @@ class HasStatesMixin(object):
     _MAX_STATES = 10
     STATE_FEATURE = ["state{0}".format(i) for i in range(_MAX_STATES)]
 
+    def _state_id(self, vocab):
+        return vocab.cached(HasStatesMixin, lambda: vocab.encode(
+            self.STATE_FEATURE))[self.state]
+
     @classmethod
     def all_features(cls):
         return super(HasStatesMixin, cls).all_features() + cls.STATE_FEATURE
@@ -56,6 +60,11 @@ class Goal(MazeItem):
         return super(Goal, self).featurize() +\
             ["goal_id" + str(self.goal_id)]
 
+    def featurize_ids(self, vocab):
+        ids = vocab.cached(Goal, lambda: vocab.encode(
+            ["goal_id" + str(k) for k in range(self.__MAX_GOAL_IDS)]))
+        return self._class_ids(vocab) + [ids[self.goal_id]]
+
     @classmethod
     def all_features(cls):
         return super(Goal, cls).all_features() +\
@@ -72,6 +81,8 @@ class Breadcrumb(MazeItem):
 
 
 class Pushable(Block):
+    MUTABLE = True
+
     def __init__(self, **kwargs):
         super(Pushable, self).__init__(**kwargs)
 
@@ -80,6 +91,8 @@ class Pushable(Block):
 
 
 class Switch(HasStatesMixin, MazeItem):
+    MUTABLE = True
+
     def __init__(self, start_state=0, nstates=2, **kwargs):
         super(Switch, self).__init__(**kwargs)
         self.state = start_state
@@ -93,13 +106,20 @@ class Switch(HasStatesMixin, MazeItem):
 
     def toggle(self):
         self.state = (self.state + 1) % self.nstates
+        self._changed()
 
     def featurize(self):
         return super(Switch, self).featurize() +\
             [self.STATE_FEATURE[self.state]]
 
+    def featurize_ids(self, vocab):
+        return self._class_ids(vocab) + \
+            [self._state_id(vocab)]
+
 
 class Door(HasStatesMixin, MazeItem):
+    MUTABLE = True
+
     def __init__(self, open=False, state=0, **kwargs):
         super(Door, self).__init__(**kwargs)
         self.isopen = open
@@ -110,17 +130,28 @@ class Door(HasStatesMixin, MazeItem):
                 None, None, None)
 
     def open(self):
-        self.isopen = True
+        if not self.isopen:
+            self.isopen = True
+            self._changed()
 
     def close(self):
-        self.isopen = False
+        if self.isopen:
+            self.isopen = False
+            self._changed()
 
     def toggle(self):
         self.isopen = not self.isopen
+        self._changed()
 
     def featurize(self):
         return super(Door, self).featurize() + \
-            ["open" if self.open else "closed", self.STATE_FEATURE[self.state]]
+            ["open" if self.isopen else "closed",
+             self.STATE_FEATURE[self.state]]
+
+    def featurize_ids(self, vocab):
+        return self._class_ids(vocab) + \
+            [vocab["open" if self.isopen else "closed"],
+             self._state_id(vocab)]
 
     @classmethod
     def all_features(cls):
@@ -2,9 +2,10 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 from __future__ import unicode_literals
-from random import shuffle, random
-from collections import defaultdict
-import itertools
+from random import getrandbits
+from collections import defaultdict, deque
+from heapq import heapify, heappush, heappop
+import numpy as np
 import mazebase.items as mi
 from .mazeutils import MazeException
 
@@ -15,6 +16,8 @@ def sprinkle(game, tiles, tilemask=None):
         [(MazeItem, float), ...] ex.
         [(Block, .5)]
     where we sprinkle MazeItem with the percent chance given by the second arg.
+    On every tile the items are tried in a random order, and the first one
+    that succeeds is sprinkled, if any.
 
     Defaults to generating on empty tiles, but you can override this with
     tilemask and specify a list of locations.
@@ -22,17 +25,48 @@ def sprinkle(game, tiles, tilemask=None):
     Returns list of item ids
     '''
     if tilemask is None:
-        tilemask = empty_locations(game)
+        xs, ys = (game._map.count == 0).nonzero()
+    else:
+        xs, ys = np.array(tilemask, dtype=np.int64).reshape(-1, 2).T
 
-    ids = []
-    for (x, y) in tilemask:
-        shuffle(tiles)
-        for tile, pct in tiles:
-            if random() < pct:
-                ids.append(game._add_item(tile(location=(x, y))))
-                break
+    # Item of every tile in one draw, len(tiles) for none
+    chances = np.cumsum(_sprinkle_chances([pct for _, pct in tiles]))
+    picks = np.searchsorted(chances, _uniform(len(xs)), side='right')
+    hit = picks < len(tiles)
+    items = [tiles[k][0](location=(x, y)) for k, x, y in zip(
+        picks[hit].tolist(), xs[hit].tolist(), ys[hit].tolist())]
+    return game._add_items(items)
 
-    return ids
+
+def _sprinkle_chances(pcts):
+    # Chance of each item ending up on a tile. Item k is sprinkled if it
+    # succeeds and all the items tried before it failed. With a random order
+    # k is at any position with the same chance, and the items before it are
+    # any subset of that size, so
+    #   P(k) = pct_k / n * sum_m e_m(others) / C(n - 1, m)
+    # with e_m the elementary symmetric polynomials of the failure chances
+    pcts = [min(max(pct, 0.), 1.) for pct in pcts]
+    n = len(pcts)
+    binomials = np.ones(1)
+    for _ in range(n - 1):
+        binomials = np.convolve(binomials, [1., 1.])
+    chances = []
+    for k, pct in enumerate(pcts):
+        e = np.ones(1)
+        for j, other in enumerate(pcts):
+            if j != k:
+                e = np.convolve(e, [1., 1. - other])
+        chances.append(pct / n * (e / binomials).sum())
+    return chances
+
+
+def _uniform(n):
+    # n draws in [0, 1) in one numpy call, seeded from random so that
+    # random.seed() still fixes the maps
+    seed = getrandbits(64)
+    if hasattr(np.random, 'default_rng'):
+        return np.random.default_rng(seed).random(n)
+    return np.random.RandomState(seed % 2 ** 32).random_sample(n)
 
 
 def empty_locations(game, bad_blocks=None, mask=lambda x, y: True):
@@ -41,18 +75,222 @@ def empty_locations(game, bad_blocks=None, mask=lambda x, y: True):
     but maybe with other block types
     mask is a function that provides valid coordinates
     '''
-    empties = []
-    for x, y in itertools.product(range(game.width), range(game.height)):
-        if not mask(x, y):
+    if bad_blocks is None:
+        free = game._map.count == 0
+    else:
+        free = ~game._map.occupied(bad_blocks)
+    xs, ys = free.nonzero()
+    return [(x, y) for x, y in zip(xs.tolist(), ys.tolist()) if mask(x, y)]
+
+
+def random_empty_location(game, bad_blocks=None):
+    '''Same as choice(empty_locations(game, bad_blocks)), but picked from
+    the free tiles the map keeps, see TileMap.free, instead of a scan'''
+    tiles = game._map.free(bad_blocks)
+    if len(tiles) == 0:
+        raise MazeException("No empty location")
+    return tiles.choice()
+
+
+def components(game, blocking=mi.Block):
+    '''
+    The 4-connected areas of tiles without blocking items, the ones
+    agent_movefunc moves between.
+
+    Returns:
+        labels: int array of (width, height), the index of the area of
+            every tile, -1 on blocked tiles
+        areas: list of the (x, y) tiles of every area
+    '''
+    labels, areas, stride = _areas(game._map, blocking)
+    labels = np.array(labels).reshape(-1, stride)[1:-1, 1:-1]
+    return labels, [[(i // stride - 1, i % stride - 1) for i in area]
+                    for area in areas]
+
+
+def _areas(tmap, blocking):
+    # Same as components, on the flattened TileMap with a blocked border
+    # around it, so the neighbours of tile i are i +- 1 and i +- stride
+    stride = tmap.height + 2
+    free = np.zeros((tmap.width + 2, stride), dtype=np.bool_)
+    free[1:-1, 1:-1] = ~tmap.occupied(blocking)
+    starts = np.flatnonzero(free).tolist()
+    free = free.ravel().tolist()
+    labels = [-1] * len(free)
+    areas = []
+    offsets = (stride, -stride, 1, -1)
+    for start in starts:
+        if labels[start] >= 0:
             continue
-        itemlst = game._map[x][y]
-        if bad_blocks is None and itemlst == []:
-            empties.append((x, y))
-        elif bad_blocks is not None and not any(
-                isinstance(item, typ) for
-                item, typ in itertools.product(itemlst, bad_blocks)):
-            empties.append((x, y))
-    return empties
+        label = len(areas)
+        labels[start] = label
+        tiles = [start]
+        for node in tiles:
+            for offset in offsets:
+                edge = node + offset
+                if free[edge] and labels[edge] < 0:
+                    labels[edge] = label
+                    tiles.append(edge)
+        areas.append(tiles)
+    return labels, areas, stride
+
+
+class Components(object):
+    '''
+    The areas of components() for a TileMap, kept up to date as the map
+    changes, so asking whether one tile can be reached from another is a
+    couple of lookups instead of a search. BaseMazeGame._components() keeps
+    one for the current map:
+
+        if not game._components().connected(agent_loc, goal_loc):
+
+    Changes are read from the map's dirty log, see TileMap.dirty_since.
+    Unblocked tiles join the areas around them in a union-find. Blocking a
+    tile may split its area, so then the areas are labeled again.
+    '''
+
+    def __init__(self, tmap, blocking=mi.Block, areas=None, stats=None):
+        '''
+        areas: what _areas(tmap, blocking) just returned, if it was called
+            anyway, to start from
+        stats: mazebase.utils.stats.Stats to time the labelings in
+        '''
+        self.map = tmap
+        self.blocking = blocking
+        self._stats = stats
+        self.__relabel(areas)
+
+    def __relabel(self, areas=None):
+        if areas is None:
+            if self._stats is not None:
+                with self._stats.timer('components'):
+                    areas = _areas(self.map, self.blocking)
+            else:
+                areas = _areas(self.map, self.blocking)
+        self.__labels, areas, self.__stride = areas
+        # Union-find over the labels, a label is an area while it is its
+        # own parent
+        self.__parent = list(range(len(areas)))
+        self.__changes = self.map.changes
+
+    def __find(self, label):
+        parent = self.__parent
+        while parent[label] != label:
+            parent[label] = parent[parent[label]]
+            label = parent[label]
+        return label
+
+    def __update(self):
+        if self.__changes == self.map.changes:
+            return
+        dirty = self.map.dirty_since(self.__changes)
+        self.__changes = self.map.changes
+        if dirty is None:
+            return self.__relabel()
+        labels, stride = self.__labels, self.__stride
+        unblocked = []
+        for x, y in set(dirty):
+            tile = (x + 1) * stride + y + 1
+            blocked = self.map.has(x, y, self.blocking)
+            if blocked and labels[tile] >= 0:
+                return self.__relabel()
+            if not blocked and labels[tile] < 0:
+                unblocked.append(tile)
+        parent = self.__parent
+        for tile in unblocked:
+            label = labels[tile] = len(parent)
+            parent.append(label)
+            for offset in (stride, -stride, 1, -1):
+                other = labels[tile + offset]
+                if other >= 0:
+                    parent[self.__find(other)] = self.__find(label)
+
+    def label(self, location):
+        '''Label of the area of location, the same for every tile of it
+        until the map changes, or -1 if location is blocked'''
+        self.__update()
+        x, y = location
+        label = self.__labels[(x + 1) * self.__stride + y + 1]
+        return self.__find(label) if label >= 0 else -1
+
+    def connected(self, a, b):
+        '''Whether agent_movefunc can get from tile a to tile b'''
+        label = self.label(a)
+        return label >= 0 and label == self.label(b)
+
+
+def connect(game, ids):
+    '''
+    Removes Blocks among the items ids, usually those sprinkle added, until
+    the tiles without a Block form one area, or as close to that as removing
+    them gets. Other blocks, like walls, are left alone.
+
+    Starting from the largest area, it searches outwards through the
+    removable blocks, and whenever it reaches another area it removes the
+    blocks on the cheapest way there from what is connected so far. So only
+    blocks that separate areas go, and anything placed on a tile without a
+    Block afterwards can be reached from any other such tile.
+
+    Returns the ids of the removed blocks.
+    '''
+    if game.stats is not None:
+        with game.stats.timer('components'):
+            labels, areas, stride = _areas(game._map, mi.Block)
+    else:
+        labels, areas, stride = _areas(game._map, mi.Block)
+    # Reachability checks after this start from these labels
+    game._component_cache[mi.Block] = Components(
+        game._map, mi.Block, (labels, areas, stride), game.stats)
+    if len(areas) <= 1:
+        return []
+    removable = {}
+    for id in ids:
+        item = game._items.get(id)
+        if isinstance(item, mi.Block):
+            x, y = item.location
+            removable[(x + 1) * stride + y + 1] = id
+
+    # 0-1 breadth first search: tiles of connected areas cost nothing,
+    # every removable block costs 1
+    dist = [len(labels)] * len(labels)
+    path = {}
+    frontier = deque()
+    connected = set()
+
+    def add_area(label):
+        connected.add(label)
+        for tile in areas[label]:
+            dist[tile] = 0
+            frontier.appendleft(tile)
+
+    add_area(max(range(len(areas)), key=lambda label: len(areas[label])))
+    offsets = (stride, -stride, 1, -1)
+    removed = []
+    while frontier and len(connected) < len(areas):
+        node = frontier.popleft()
+        weight = dist[node] + 1
+        for offset in offsets:
+            edge = node + offset
+            label = labels[edge]
+            if label >= 0:
+                if label in connected:
+                    continue
+                # Remove the blocks on the way here, which now cost nothing
+                tile = node
+                while dist[tile] > 0:
+                    id = removable.pop(tile)
+                    game._remove_item(id)
+                    removed.append(id)
+                    dist[tile] = 0
+                    frontier.appendleft(tile)
+                    tile = path[tile]
+                weight = 1
+                add_area(label)
+            elif edge in removable and dist[edge] > weight:
+                dist[edge] = weight
+                path[edge] = node
+                frontier.append(edge)
+    return removed
 
 
 def dijkstra(game, initial, movefunc, weighted=False):
@@ -66,32 +304,214 @@ def dijkstra(game, initial, movefunc, weighted=False):
     Returns:
         visited: dictionary of {location: distance} pairs
         path: dictionary of {location: previous_location} pairs
+
+    Unweighted searches are a breadth first search, weighted ones use a
+    binary heap. Unreachable locations have distance 1e309 in visited.
     '''
+    if game.stats is not None:
+        with game.stats.timer('dijkstra'):
+            return _dijkstra(game, initial, movefunc, weighted)
+    return _dijkstra(game, initial, movefunc, weighted)
+
+
+def _dijkstra(game, initial, movefunc, weighted):
+    if not weighted:
+        return bfs(game, initial, movefunc)
+    field = DistanceField(game, initial, movefunc, weighted)
+    field._stats = None  # Already timed as dijkstra
+    field.complete()
+    return defaultdict(lambda: 1e309, field.visited), field.path
+
+
+def bfs(game, initial, movefunc):
+    '''Same as dijkstra, when every move costs 1'''
     visited = defaultdict(lambda: 1e309)
     visited[initial] = 0
     path = {}
 
-    nodes = set(itertools.product(range(game.width), range(game.height)))
-    while nodes:
-        current = nodes.intersection(visited.keys())
-        if not current:
-            break
-        min_node = min(current, key=visited.get)
-        nodes.remove(min_node)
-        current_weight = visited[min_node]
-        x, y = min_node
-
-        for edge in movefunc(game, min_node):
-            # Maximize reward by minimizing "distance = - reward"
-            w = -game._approx_reward_map[edge[0]][edge[1]] if weighted else 1
-            weight = current_weight + w
-            if edge not in visited or weight < visited[edge]:
+    neighbours = _neighbours(game, movefunc)
+    frontier = deque([initial])
+    while frontier:
+        node = frontier.popleft()
+        weight = visited[node] + 1
+        for edge in neighbours(node):
+            if edge not in visited:
                 visited[edge] = weight
-                path[edge] = min_node
+                path[edge] = node
+                frontier.append(edge)
 
     return visited, path
 
 
+def astar(game, initial, target, movefunc, weighted=False):
+    '''
+    Same as dijkstra, but stops as soon as the shortest path to target is
+    known. visited holds the distance to target, if it is reachable, and
+    whatever else was explored on the way. movefunc must only move to the 4
+    neighbouring tiles, see DistanceField.
+    '''
+    field = DistanceField(game, initial, movefunc, weighted)
+    field.distance(target)
+    return defaultdict(lambda: 1e309, field.visited), field.path
+
+
+class DistanceField(object):
+    '''
+    Distances from a single source, searched lazily. distance(loc) runs an A*
+    search towards loc that stops once its distance is final, and the next
+    query picks up where the last one stopped, so asking for many targets
+    costs at most one full search. See dijkstra for the arguments.
+
+    The heuristic is the manhattan distance times the cheapest move, so
+    movefunc must only move to the 4 neighbouring tiles. Every node A* settles
+    with that heuristic has its final distance, which is what lets a search
+    towards one target continue towards another.
+
+    visited and path are the same as dijkstra's once complete() is called.
+    The field is stale once the map or game._approx_reward_map changes.
+    '''
+
+    def __init__(self, game, source, movefunc, weighted=False):
+        self.source = source
+        self.weighted = weighted
+        self.visited = {source: 0}
+        self.path = {}
+        self._neighbours = _neighbours(game, movefunc)
+        self._stats = game.stats
+        if weighted:
+            self._rewards = game._approx_reward_map
+            # Cheapest possible move, so the heuristic never overestimates
+            self._step = max(0, -max(max(col) for col in self._rewards))
+        else:
+            self._step = 1
+        self._target = None
+        # (estimated total distance, distance, node)
+        self._heap = [(0, 0, source)]
+        self._settled = set()
+
+    def distance(self, loc):
+        '''Distance from source to loc, 1e309 if unreachable'''
+        if loc not in self._settled:
+            self._search(loc)
+        return self.visited.get(loc, 1e309)
+
+    def complete(self):
+        '''Finishes the search, returns self'''
+        self._search(None)
+        return self
+
+    def _retarget(self, target):
+        self._target = target
+        if target is None:
+            heap = [(g, g, node) for _, g, node in self._heap]
+        else:
+            tx, ty = target
+            step = self._step
+            heap = [(g + step * (abs(tx - node[0]) + abs(ty - node[1])),
+                     g, node) for _, g, node in self._heap]
+        heapify(heap)
+        self._heap = heap
+
+    def _search(self, target):
+        if self._stats is None:
+            return self.__search(target)
+        with self._stats.timer('distance_field'):
+            self.__search(target)
+
+    def __search(self, target):
+        if target != self._target:
+            self._retarget(target)
+        visited, path = self.visited, self.path
+        neighbours = self._neighbours
+        heap, settled = self._heap, self._settled
+        weighted, rewards, step = self.weighted, \
+            getattr(self, '_rewards', None), self._step
+        if target is not None:
+            tx, ty = target
+        while heap:
+            _, current_weight, node = heappop(heap)
+            if node in settled:
+                continue  # Stale entry, node was reached more cheaply
+            settled.add(node)
+            for edge in neighbours(node):
+                # Maximize reward by minimizing "distance = - reward"
+                if weighted:
+                    weight = current_weight - rewards[edge[0]][edge[1]]
+                else:
+                    weight = current_weight + 1
+                if edge not in visited or weight < visited[edge]:
+                    visited[edge] = weight
+                    path[edge] = node
+                    if target is None:
+                        estimate = weight
+                    else:
+                        estimate = weight + step * (abs(tx - edge[0]) +
+                                                    abs(ty - edge[1]))
+                    heappush(heap, (estimate, weight, edge))
+            if node == target:
+                return
+
+
+def shortest_tour(start, dist):
+    '''
+    Length of the shortest walk visiting every target once, in any order,
+    by Held-Karp's dynamic program over the subsets of targets. Exact, in
+    O(2^k k^2) for k targets, in numpy a handful of operations per subset
+    size, so fine for the 10 goals a game can have.
+
+    Args:
+        start: distances from the starting point to every target
+        dist: k x k distances between the targets, dist[i][j] from i to j,
+            which need not be symmetric. Unreachable is inf.
+    '''
+    start = np.asarray(start, dtype=np.float64)
+    dist = np.asarray(dist, dtype=np.float64)
+    k = len(start)
+    if k == 0:
+        return 0.
+    # cost[subset, j]: shortest walk through the targets in subset, a
+    # bitmask, ending at target j. Subsets are done by size, from the
+    # subsets one smaller, all (subset, j) pairs of a size at once
+    subsets = np.arange(1 << k)
+    bits = 1 << np.arange(k)
+    cost = np.full((1 << k, k), np.inf)
+    cost[bits, np.arange(k)] = start
+    members = (subsets[:, None] & bits) != 0
+    sizes = members.sum(axis=1)
+    for size in range(2, k + 1):
+        layer = subsets[sizes == size]
+        rows, ends = members[layer].nonzero()
+        # min over i of cost[subset without j, i] + dist[i, j]
+        before = layer[rows] ^ bits[ends]
+        cost[layer[rows], ends] = (cost[before] + dist.T[ends]).min(axis=1)
+    return float(cost[-1].min())
+
+
+def _neighbours(game, movefunc):
+    '''Returns f(loc) -> movefunc(game, loc). For agent_movefunc we read a
+    snapshot of the block mask instead, which is a lot faster'''
+    if movefunc is not agent_movefunc:
+        return lambda loc: movefunc(game, loc)
+
+    w, h = game.width, game.height
+    free = (~game._map.occupied(mi.Block)).tolist()
+
+    def neighbours(loc):
+        x, y = loc
+        res = []
+        if x + 1 < w and free[x + 1][y]:
+            res.append((x + 1, y))
+        if x > 0 and free[x - 1][y]:
+            res.append((x - 1, y))
+        if y + 1 < h and free[x][y + 1]:
+            res.append((x, y + 1))
+        if y > 0 and free[x][y - 1]:
+            res.append((x, y - 1))
+        return res
+
+    return neighbours
+
+
 def __movefunc_helper(game, loc, movefunc_helper):
     res = []
     x, y = loc
@@ -110,7 +530,23 @@ def agent_movefunc(game, loc):
         x, y = loc
         dx, dy = dloc
         nx, ny = x + dx, y + dy
-        return game._tile_get_block((nx, ny), mi.Block) is None
+        return not game._tile_has((nx, ny), mi.Block)
+
+    return __movefunc_helper(game, loc, helper)
+
+
+def through_pushable_movefunc(game, loc):
+    ''' Like agent_movefunc, but can also move onto Pushables, as if they
+    were pushed out of the way '''
+    def helper(game, loc, dloc):
+        x, y = loc
+        dx, dy = dloc
+        nx, ny = x + dx, y + dy
+        if not game._tile_has((nx, ny), mi.Block):
+            return True
+        return not any(isinstance(item, mi.Block) and
+                       not isinstance(item, mi.Pushable)
+                       for item in game._map.at(nx, ny))
 
     return __movefunc_helper(game, loc, helper)
 
@@ -124,7 +560,7 @@ def pushblock_movefunc(game, loc):
         tx, ty = x - dx, y - dy
         nx, ny = x + dx, y + dy
         return (game._in_bounds((tx, ty)) and
-                game._tile_get_block((nx, ny), mi.Block) is None and
-                game._tile_get_block((tx, ty), mi.Block) is None)
+                not game._tile_has((nx, ny), mi.Block) and
+                not game._tile_has((tx, ty), mi.Block))
 
     return __movefunc_helper(game, loc, helper)
@@ -0,0 +1,130 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+import numpy as np
+
+# Compact forms of numeric observations, to keep in replay memory or send
+# between processes. Few hot planes, like those of grid_one_hot or the
+# DenseGridMixin featurizers, only need a bit per feature: pack_planes packs
+# the feature axis into bytes, 64x smaller than float64. Token ids, like
+# those of vocabify, fit in the smallest unsigned dtype for the vocabulary.
+# DeltaEncoder and DeltaDecoder send a stream of sparse observations as the
+# changes between them.
+
+
+def token_dtype(nwords):
+    '''Smallest unsigned dtype holding the ids of a vocabulary of nwords'''
+    for dtype in [np.uint8, np.uint16, np.uint32]:
+        if nwords <= np.iinfo(dtype).max + 1:
+            return dtype
+    return np.uint64
+
+
+def pack_tokens(tokens, nwords):
+    '''Array of token ids in token_dtype(nwords)'''
+    return np.asarray(tokens).astype(token_dtype(nwords), copy=False)
+
+
+def unpack_tokens(tokens, dtype=np.int64):
+    '''Token ids packed by pack_tokens, back in dtype'''
+    return np.asarray(tokens).astype(dtype)
+
+
+def pack_planes(planes, axis=-1):
+    '''
+    Few hot planes with the features along axis, as uint8 with 8 features
+    per byte. The number of features has to be kept to unpack them.
+    '''
+    return np.packbits(np.asarray(planes) != 0, axis=axis)
+
+
+def unpack_planes(packed, nfeatures, axis=-1, dtype=np.float32, out=None):
+    '''
+    Planes packed by pack_planes, as 0 and 1 of dtype. Give out to unpack
+    into an existing array instead, it must have nfeatures along axis.
+    '''
+    bits = np.unpackbits(packed, axis=axis, count=nfeatures)
+    if out is None:
+        return bits.astype(dtype, copy=False)
+    np.copyto(out, bits)
+    return out
+
+
+class DeltaEncoder(object):
+    '''
+    Encodes a stream of sparse observations of a game, like those of
+    grid_one_hot_sparse, as the changes from the previous one. Rows can
+    have any number of indices, so (batch, x, y, vocab_i) rows of
+    grid_one_hot_sparse_batch work as well, for a stream of batches.
+
+        encoder = DeltaEncoder((max_w, max_h, len(game.vocabulary())))
+        delta = encoder.encode(grid_one_hot_sparse(game, grid), side_info)
+        # send delta, and on the other end
+        planes, side_info = decoder.decode(delta)
+
+    A delta is a tuple (added, removed, side_info): int64 arrays of the rows
+    that appeared and disappeared, and the side info, which is None if it
+    didn't change. The first delta, and the first after reset(), holds the
+    whole observation. Usually only the few tiles around the agent change.
+    '''
+
+    def __init__(self, shape):
+        '''shape: the shape of the dense observation, e.g. (x, y,
+        nfeatures), that the rows index into'''
+        self.shape = tuple(shape)
+        self.reset()
+
+    def reset(self):
+        '''Starts over, when the decoder does too or may be out of sync'''
+        self.__keys = np.zeros(0, dtype=np.int64)
+        self.__side_info = None
+
+    def encode(self, rows, side_info=None):
+        rows = np.asarray(rows, dtype=np.int64).reshape(-1, len(self.shape))
+        keys = np.unique(np.ravel_multi_index(rows.T, self.shape))
+        added = np.setdiff1d(keys, self.__keys, assume_unique=True)
+        removed = np.setdiff1d(self.__keys, keys, assume_unique=True)
+        self.__keys = keys
+        if _same(side_info, self.__side_info):
+            side_info = None
+        else:
+            self.__side_info = side_info
+        return self.__rows(added), self.__rows(removed), side_info
+
+    def __rows(self, keys):
+        return np.stack(np.unravel_index(keys, self.shape), axis=1).astype(
+            np.int64, copy=False).reshape(-1, len(self.shape))
+
+
+class DeltaDecoder(object):
+    '''
+    Rebuilds the observations encoded by a DeltaEncoder, as dense few hot
+    planes of shape and dtype, and the latest side info. decode() returns
+    the same planes every call, updated in place, so copy them to keep them.
+    '''
+
+    def __init__(self, shape, dtype=np.float32):
+        self.planes = np.zeros(shape, dtype=dtype)
+        self.side_info = None
+
+    def reset(self):
+        self.planes.fill(0)
+        self.side_info = None
+
+    def decode(self, delta):
+        '''(planes, side_info) after applying delta'''
+        added, removed, side_info = delta
+        self.planes[tuple(removed.T)] = 0
+        self.planes[tuple(added.T)] = 1
+        if side_info is not None:
+            self.side_info = side_info
+        return self.planes, self.side_info
+
+
+def _same(a, b):
+    if a is None or b is None:
+        return a is b
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return np.array_equal(a, b)
+    return a == b
@@ -0,0 +1,66 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+import numpy as np
+
+
+class FrameStack(object):
+    '''
+    The last k frames of a game, or of a batch of games stepped in
+    lockstep, stacked oldest first without moving them around.
+
+    Frames are kept in a ring of 2k slots, each frame written to slot i and
+    i + k, so the last k frames are always the slice [i + 1, i + k]. stacked()
+    is a view of that slice: (k,) + shape, or (batch, k) + shape with batch.
+    No allocation per frame, just one extra copy of it.
+
+    Write frames in place where the featurizer allows it:
+
+        stack = FrameStack(dense.grid_shape(game), 4)
+        dense.featurize_grid(game, game.current_agent(), out=stack.slot())
+        frames = stack.push()
+
+    or push(frame) to copy one in. The view stays valid, but its contents
+    change with the next push, so copy it to keep it.
+    '''
+
+    def __init__(self, shape, k, batch=None, dtype=np.uint8):
+        self.k = k
+        self.batch = batch
+        time = (2 * k,) if batch is None else (batch, 2 * k)
+        self.buffer = np.zeros(time + tuple(shape), dtype=dtype)
+        # Slot of the newest frame
+        self.__i = k - 1
+
+    def __slot(self, i):
+        return self.buffer[i] if self.batch is None else self.buffer[:, i]
+
+    def slot(self):
+        '''Where the next frame goes, to write it before calling push()'''
+        return self.__slot((self.__i + 1) % self.k)
+
+    def push(self, frame=None):
+        '''Adds frame, or what was written into slot(), as the newest frame
+        and returns stacked()'''
+        i = (self.__i + 1) % self.k
+        if frame is not None:
+            self.__slot(i)[...] = frame
+        self.__slot(i + self.k)[...] = self.__slot(i)
+        self.__i = i
+        return self.stacked()
+
+    def stacked(self):
+        '''View of the last k frames, oldest first'''
+        i = self.__i + 1
+        if self.batch is None:
+            return self.buffer[i:i + self.k]
+        return self.buffer[:, i:i + self.k]
+
+    def clear(self, index=None):
+        '''Zeros all frames, or those of game index of the batch, e.g. when
+        it starts a new episode'''
+        if index is None:
+            self.buffer.fill(0)
+        else:
+            self.buffer[index].fill(0)
@@ -0,0 +1,86 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+from collections import defaultdict
+from contextlib import contextmanager
+from timeit import default_timer
+
+
+class Stats(object):
+    '''
+    Call counts and cumulative wall time of the phases of a game, to find
+    out where the time goes. Attach one with collect_stats() or
+    game._set_stats(stats), the games record:
+
+        reset               reset(), retries included
+        reset.retry.<cause> MazeExceptions raised by _reset, by message
+        reset.searches      dijkstra, distance_field and components calls
+                            made while resetting
+        act                 act() and act_index()
+        step_hook           _step()
+        reward              _get_reward()
+        approx_reward       approx_best_reward() computations
+        featurize           observe(), and featurize.* for its parts
+        dijkstra            creationutils.dijkstra / bfs
+        distance_field      DistanceField searches, incl. astar and the
+                            distance fields of the reward estimates
+        components          labelings of the areas of a map, for
+                            connect() and Components
+
+    Nested phases are included in the time of the outer ones. Without stats
+    attached the games only pay for an `is None` check per phase.
+    '''
+
+    def __init__(self):
+        self.calls = defaultdict(int)
+        self.times = defaultdict(float)
+
+    def count(self, name, n=1):
+        self.calls[name] += n
+
+    def add(self, name, seconds):
+        self.calls[name] += 1
+        self.times[name] += seconds
+
+    @contextmanager
+    def timer(self, name):
+        start = default_timer()
+        try:
+            yield
+        finally:
+            self.add(name, default_timer() - start)
+
+    def clear(self):
+        self.calls.clear()
+        self.times.clear()
+
+    def as_dict(self):
+        '''{phase: {'calls': n, 'time': seconds}}, e.g. to dump to a log'''
+        return dict((name, {'calls': n, 'time': self.times.get(name, 0.)})
+                    for name, n in self.calls.items())
+
+    def __str__(self):
+        lines = ["{0:<40} {1:>10} {2:>12}".format("phase", "calls", "ms")]
+        for name in sorted(self.calls):
+            lines.append("{0:<40} {1:>10} {2:>12.1f}".format(
+                name, self.calls[name], 1000 * self.times.get(name, 0.)))
+        return "\n".join(lines)
+
+
+@contextmanager
+def collect_stats(game, stats=None):
+    '''
+    Records stats of game, which may be a wrapper like MazeGame, while in
+    the with block:
+
+        with collect_stats(game) as stats:
+            run_episodes(game)
+        print(stats)
+    '''
+    stats = Stats() if stats is None else stats
+    game._set_stats(stats)
+    try:
+        yield stats
+    finally:
+        game._set_stats(None)
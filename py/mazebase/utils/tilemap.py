@@ -0,0 +1,367 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+import random
+import threading
+from collections import defaultdict
+import numpy as np
+import six
+
+# Every item class gets a bit in the per tile type mask. The registry is
+# global, so a bit means the same class in every map. Games may be reset in
+# other threads, see PrefetchingGame, so registering classes and building
+# masks holds _registry_lock; looking up what is already there doesn't.
+_MAX_TYPES = 63
+_type_bits = {}
+_type_masks = {}
+_registry_lock = threading.Lock()
+
+
+def type_bit(cls):
+    '''Bit of item class cls in TileMap.mask, registering cls if needed'''
+    bit = _type_bits.get(cls)
+    if bit is None:
+        with _registry_lock:
+            if cls not in _type_bits:
+                assert len(_type_bits) < _MAX_TYPES, \
+                    "Can't register more than {0} item classes".format(
+                        _MAX_TYPES)
+                _type_bits[cls] = 1 << len(_type_bits)
+                # New class may be a subclass of anything queried so far
+                _type_masks.clear()
+            bit = _type_bits[cls]
+    return bit
+
+
+def type_mask(types):
+    '''Mask of all registered classes that are instances of types, which
+    is a class or tuple of classes like isinstance takes'''
+    mask = _type_masks.get(types)
+    if mask is None:
+        with _registry_lock:
+            mask = _type_masks.get(types)
+            if mask is None:
+                mask = sum(bit for cls, bit in _type_bits.items()
+                           if issubclass(cls, types))
+                _type_masks[types] = mask
+    return mask
+
+
+def _scalars(array):
+    # What single tiles of array are read and written through
+    return memoryview(array) if six.PY3 else array
+
+
+class TileSet(object):
+    '''
+    Set of (x, y) tiles that can also pick a random tile in O(1): a list of
+    the tiles, and the index of every tile in it. Removing a tile moves the
+    last one into its place.
+    '''
+
+    def __init__(self, tiles=()):
+        self.tiles = list(tiles)
+        self.index = dict(zip(self.tiles, range(len(self.tiles))))
+
+    def __len__(self):
+        return len(self.tiles)
+
+    def __contains__(self, tile):
+        return tile in self.index
+
+    def __iter__(self):
+        return iter(self.tiles)
+
+    def add(self, tile):
+        if tile not in self.index:
+            self.index[tile] = len(self.tiles)
+            self.tiles.append(tile)
+
+    def discard(self, tile):
+        i = self.index.pop(tile, None)
+        if i is None:
+            return
+        last = self.tiles.pop()
+        if i < len(self.tiles):
+            self.tiles[i] = last
+            self.index[last] = i
+
+    def choice(self):
+        return random.choice(self.tiles)
+
+    def copy(self):
+        other = TileSet.__new__(TileSet)
+        other.tiles = list(self.tiles)
+        other.index = self.index.copy()
+        return other
+
+
+class TileMap(object):
+    '''
+    Storage for the items of a width x height maze.
+
+    Every item added gets an integer handle. Each tile is a dict of
+    {handle: item}, so adding, moving and removing an item is O(1). Next to
+    the tiles we keep numpy occupancy planes: one per item class counting
+    the items of exactly that class on each tile, and one counting all
+    items. Use these for whole map queries instead of walking the tiles.
+    Single tile updates go through memoryviews of the planes, which is a lot
+    cheaper than indexing numpy arrays one scalar at a time (on Python 2,
+    whose memoryviews can't do that, through the arrays themselves).
+
+    mask holds, for every tile, the OR of the type_bit of each class present,
+    so asking whether a tile holds an instance of some class is a single
+    lookup, see has().
+
+    version goes up on every change, so anything derived from the map can
+    tell when it is out of date.
+
+    The tiles of the latest changes are logged as well, including those
+    marked with touch() because an item on them changed state. Something
+    kept up to date from the map remembers changes and redraws the tiles of
+    dirty_since(changes) instead of the whole map.
+
+    hidden is the set of classes that invisible items were added of, so
+    featurizers know for which classes a plane isn't what the agent sees.
+    Items must not become invisible after they are added.
+
+    free(types) is the TileSet of tiles without instances of types, or
+    without any item if types is None. Each is built the first time it is
+    asked for, and kept up to date from then on, so placing items at random
+    doesn't have to look at the whole map.
+
+    The game owns the TileMap and keeps it in sync through _add_item,
+    _move_item and _remove_item, don't modify it directly.
+    '''
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.version = 0
+        # handle -> item, None once the item is removed
+        self.items = []
+        self.tiles = [[{} for y in range(height)] for x in range(width)]
+        self.count = np.zeros((width, height), dtype=np.int32)
+        self.mask = np.zeros((width, height), dtype=np.int64)
+        self.planes = {}
+        self.hidden = set()
+        # Tiles of the latest changes, and the number dropped before them
+        self._dirty = []
+        self._dropped = 0
+        # types -> TileSet of the tiles without them, see free()
+        self._free = {}
+        self._count = _scalars(self.count)
+        self._mask = _scalars(self.mask)
+        self._planes = {}
+
+    def __getstate__(self):
+        # memoryviews can't be copied or pickled, rebuild them instead
+        state = self.__dict__.copy()
+        del state['_count'], state['_mask'], state['_planes']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._count = _scalars(self.count)
+        self._mask = _scalars(self.mask)
+        self._planes = dict((cls, _scalars(plane))
+                            for cls, plane in self.planes.items())
+
+    def copy(self, replace=None):
+        '''
+        Copy of the map that can be changed independently. Items are shared
+        with this map, except those in replace, a {handle: item} dict of
+        items to put in their place.
+        '''
+        other = TileMap.__new__(TileMap)
+        state = self.__getstate__()
+        state['items'] = list(self.items)
+        state['tiles'] = [list(map(dict.copy, col)) for col in self.tiles]
+        state['hidden'] = set(self.hidden)
+        state['_dirty'] = list(self._dirty)
+        state['_free'] = dict((types, tiles.copy())
+                              for types, tiles in self._free.items())
+        state['count'] = self.count.copy()
+        state['mask'] = self.mask.copy()
+        state['planes'] = dict((cls, plane.copy())
+                               for cls, plane in self.planes.items())
+        other.__setstate__(state)
+        for handle, item in (replace or {}).items():
+            x, y = item.location
+            other.items[handle] = item
+            other.tiles[x][y][handle] = item
+        return other
+
+    @property
+    def changes(self):
+        '''Number of tile changes so far'''
+        return self._dropped + len(self._dirty)
+
+    def dirty_since(self, changes):
+        '''
+        Tiles that changed since self.changes was changes, in order and
+        possibly repeated. None if that is too long ago to tell, then it's
+        about as cheap to look at the whole map anyway.
+        '''
+        start = changes - self._dropped
+        if start < 0:
+            return None
+        return self._dirty[start:]
+
+    def touch(self, x, y):
+        '''Marks tile (x, y) as changed, without changing the items on
+        it. version stays the same'''
+        self._dirty.append((x, y))
+        self.__trim()
+
+    def __trim(self):
+        if len(self._dirty) > self.width * self.height:
+            drop = len(self._dirty) // 2
+            del self._dirty[:drop]
+            self._dropped += drop
+
+    def free(self, types=None):
+        '''TileSet of the tiles without instances of types, a class or
+        tuple of classes, or without any items if None. Don't modify it'''
+        types = tuple(types) if isinstance(types, (list, set)) else types
+        if types not in self._free:
+            free = self.count == 0 if types is None else \
+                ~self.occupied(types)
+            xs, ys = free.nonzero()
+            self._free[types] = TileSet(zip(xs.tolist(), ys.tolist()))
+        return self._free[types]
+
+    def __update_free(self, x, y):
+        for types, tiles in self._free.items():
+            if types is None:
+                free = self._count[x, y] == 0
+            else:
+                free = not self.has(x, y, types)
+            if free:
+                tiles.add((x, y))
+            else:
+                tiles.discard((x, y))
+
+    def at(self, x, y):
+        '''Items on tile (x, y). This is a view, so don't change the map
+        while iterating over it.'''
+        return self.tiles[x][y].values()
+
+    def has(self, x, y, types):
+        '''Whether tile (x, y) holds an instance of types'''
+        mask = _type_masks.get(types)
+        if mask is None:
+            mask = type_mask(types)
+        return (self._mask[x, y] & mask) != 0
+
+    def find(self, x, y, types):
+        '''First instance of types on tile (x, y), or None'''
+        mask = _type_masks.get(types)
+        if mask is None:
+            mask = type_mask(types)
+        if self._mask[x, y] & mask:
+            for item in self.tiles[x][y].values():
+                if isinstance(item, types):
+                    return item
+        return None
+
+    def add(self, item):
+        '''Adds item at item.location, returns its handle'''
+        handle = len(self.items)
+        self.version += 1
+        self.items.append(item)
+        x, y = item.location
+        self.tiles[x][y][handle] = item
+        self._count[x, y] += 1
+        self.__inc(type(item), x, y)
+        self.touch(x, y)
+        if self._free:
+            self.__update_free(x, y)
+        if not item.visible:
+            self.hidden.add(type(item))
+        return handle
+
+    def add_many(self, items):
+        '''Adds items at their locations, like add() for each of them but
+        with the planes updated once per class. Returns their handles'''
+        start = len(self.items)
+        self.version += 1
+        self.items.extend(items)
+        tiles = self.tiles
+        locations = defaultdict(list)
+        for handle, item in enumerate(items, start):
+            x, y = item.location
+            tiles[x][y][handle] = item
+            locations[type(item)].append((x, y))
+            if not item.visible:
+                self.hidden.add(type(item))
+        for cls, where in locations.items():
+            self._plane(cls)
+            xs, ys = np.array(where, dtype=np.int64).reshape(-1, 2).T
+            np.add.at(self.planes[cls], (xs, ys), 1)
+            np.add.at(self.count, (xs, ys), 1)
+            self.mask[xs, ys] |= _type_bits[cls]
+            self._dirty.extend(where)
+            self.__trim()
+            if self._free:
+                for x, y in where:
+                    self.__update_free(x, y)
+        return list(range(start, len(self.items)))
+
+    def move(self, handle, location):
+        item = self.items[handle]
+        x, y = item.location
+        nx, ny = location
+        self.version += 1
+        del self.tiles[x][y][handle]
+        self.tiles[nx][ny][handle] = item
+        self._count[x, y] -= 1
+        self._count[nx, ny] += 1
+        self.__dec(type(item), x, y)
+        self.__inc(type(item), nx, ny)
+        self.touch(x, y)
+        self.touch(nx, ny)
+        if self._free:
+            self.__update_free(x, y)
+            self.__update_free(nx, ny)
+
+    def remove(self, handle):
+        item = self.items[handle]
+        x, y = item.location
+        del self.tiles[x][y][handle]
+        self.version += 1
+        self.items[handle] = None
+        self._count[x, y] -= 1
+        self.__dec(type(item), x, y)
+        self.touch(x, y)
+        if self._free:
+            self.__update_free(x, y)
+
+    def __inc(self, cls, x, y):
+        self._plane(cls)[x, y] += 1
+        self._mask[x, y] |= _type_bits[cls]
+
+    def __dec(self, cls, x, y):
+        plane = self._planes[cls]
+        plane[x, y] -= 1
+        if plane[x, y] == 0:
+            self._mask[x, y] &= ~_type_bits[cls]
+
+    def plane(self, cls):
+        '''Occupancy plane of items of exactly class cls'''
+        self._plane(cls)
+        return self.planes[cls]
+
+    def _plane(self, cls):
+        if cls not in self._planes:
+            type_bit(cls)
+            self.planes[cls] = np.zeros((self.width, self.height),
+                                        dtype=np.int32)
+            self._planes[cls] = _scalars(self.planes[cls])
+        return self._planes[cls]
+
+    def occupied(self, types):
+        '''Boolean plane, True where there is an instance of any of types'''
+        types = tuple(types) if isinstance(types, (list, set)) else types
+        return (self.mask & type_mask(types)) != 0
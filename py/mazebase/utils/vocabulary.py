@@ -0,0 +1,50 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+
+class Vocabulary(object):
+    '''
+    Frozen mapping between features and integer token ids, the id of a
+    feature being its index in the sorted list of features. Games build one
+    from all_possible_features(), see BaseMazeGame.vocabulary().
+
+    Ids are the same as vocabify's, so they can be mixed. Anything derived
+    from the vocabulary that is worth keeping, like the ids of the location
+    features of a featurizer, can be kept with cached(key, make).
+    '''
+
+    def __init__(self, features):
+        self.words = tuple(sorted(set(features)))
+        self.ids = dict((b, a) for a, b in enumerate(self.words))
+        self.__cache = {}
+
+    def __len__(self):
+        return len(self.words)
+
+    def __getitem__(self, word):
+        return self.ids[word]
+
+    def __contains__(self, word):
+        return word in self.ids
+
+    def get(self, word, default=None):
+        return self.ids.get(word, default)
+
+    def word(self, id):
+        return self.words[id]
+
+    def encode(self, words):
+        ids = self.ids
+        return [ids[word] for word in words]
+
+    def decode(self, ids):
+        words = self.words
+        return [words[id] for id in ids]
+
+    def cached(self, key, make):
+        '''make(), computed once per key for this vocabulary'''
+        if key not in self.__cache:
+            self.__cache[key] = make()
+        return self.__cache[key]
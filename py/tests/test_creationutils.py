@@ -0,0 +1,120 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+import itertools
+import random
+import unittest
+
+import mazebase.games as games
+import mazebase.items as mi
+from mazebase.utils import creationutils
+from mazebase.utils.stats import Stats
+
+
+class TestComponents(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+        self.game = games.SingleGoal(
+            map_size=(10, 10, 10, 10), blockpct=0.3, connected=False,
+            approximate_reward=None)
+        self.stats = Stats()
+        self.components = creationutils.Components(
+            self.game._map, mi.Block, stats=self.stats)
+
+    def relabels(self):
+        return self.stats.calls['components']
+
+    def blocked(self, loc):
+        return self.game._map.has(loc[0], loc[1], mi.Block)
+
+    def assertMatchesBfs(self, sources=3):
+        game, components = self.game, self.components
+        tiles = [(x, y) for x in range(game.width)
+                 for y in range(game.height)]
+        for a in random.sample(tiles, sources):
+            if self.blocked(a):
+                self.assertEqual(components.label(a), -1)
+                continue
+            visited, _ = creationutils.bfs(
+                game, a, creationutils.agent_movefunc)
+            for b in tiles:
+                self.assertEqual(components.connected(a, b),
+                                 b in visited and not self.blocked(b),
+                                 (a, b))
+
+    def unblocked_tile(self):
+        return random.choice(list(self.game._map.free(mi.Block)))
+
+    def some_block(self):
+        return random.choice([item for item in self.game._items.values()
+                              if type(item) is mi.Block])
+
+    def test_matches_bfs_as_blocks_change(self):
+        game = self.game
+        unions = 0
+        for step in range(300):
+            relabels = self.relabels()
+            op = random.choice(['add', 'move', 'remove'])
+            if op == 'add':
+                game._add_item(mi.Block(location=self.unblocked_tile()))
+            elif op == 'move':
+                game._move_item(self.some_block().id, self.unblocked_tile())
+            else:
+                game._remove_item(self.some_block().id)
+            self.assertMatchesBfs()
+            if op == 'remove':
+                # Unblocking a tile only joins areas
+                self.assertEqual(self.relabels(), relabels)
+                unions += 1
+            elif op == 'add':
+                self.assertEqual(self.relabels(), relabels + 1)
+        self.assertGreater(unions, 0)
+
+    def test_relabels_after_many_changes(self):
+        game = self.game
+        self.assertMatchesBfs()
+        relabels = self.relabels()
+        for _ in range(game.width * game.height):
+            game._map.touch(random.randrange(game.width),
+                            random.randrange(game.height))
+        game._remove_item(self.some_block().id)
+        game._add_item(mi.Block(location=self.unblocked_tile()))
+        self.assertMatchesBfs()
+        self.assertEqual(self.relabels(), relabels + 1)
+
+
+class TestSprinkleChances(unittest.TestCase):
+    def enumerated(self, pcts):
+        # Chance of every item, averaged over every order of trying them
+        pcts = [min(max(pct, 0.), 1.) for pct in pcts]
+        chances = [0.] * len(pcts)
+        orders = list(itertools.permutations(range(len(pcts))))
+        for order in orders:
+            fail = 1.
+            for k in order:
+                chances[k] += fail * pcts[k] / len(orders)
+                fail *= 1 - pcts[k]
+        return chances
+
+    def assertChances(self, pcts):
+        for got, want in zip(creationutils._sprinkle_chances(pcts),
+                             self.enumerated(pcts)):
+            self.assertAlmostEqual(got, want, places=12, msg=pcts)
+
+    def test_matches_enumerating_orders(self):
+        random.seed(0)
+        for n in range(1, 6):
+            for _ in range(20):
+                self.assertChances([random.random() for _ in range(n)])
+
+    def test_edge_chances(self):
+        self.assertChances([])
+        self.assertChances([0.])
+        self.assertChances([1., 1.])
+        self.assertChances([0., 1., 0.5])
+        self.assertChances([1.5, -0.5, 0.3])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+import random
+import unittest
+
+import mazebase.games as games
+from mazebase.games import curriculum
+
+
+class TestForkCurriculumWrapped(unittest.TestCase):
+    def setUp(self):
+        random.seed(0)
+        self.map_size = curriculum.MapSizeCurriculum(
+            (5, 5, 5, 5), (5, 5, 5, 5), (8, 8, 8, 8))
+
+    def wrapped(self):
+        return curriculum.CurriculumWrappedGame(
+            games.SingleGoal, curriculums={'map_size': self.map_size})
+
+    def test_fork_resets_itself(self):
+        game = self.wrapped()
+        before = game.observe()
+        fork = game.fork()
+        fork.reset()
+        self.assertEqual(game.observe(), before)
+        self.assertIsNot(fork._map, game._map)
+        self.assertEqual(fork.get_max_bounds(), (8, 8))
+
+    def test_fork_follows_curriculum(self):
+        game = self.wrapped()
+        fork = game.fork()
+        self.map_size.make_hardest()
+        fork.reset()
+        self.assertEqual((fork.width, fork.height), (8, 8))
+        self.assertEqual((game.width, game.height), (5, 5))
+
+    def test_restore_keeps_methods_bound(self):
+        game = self.wrapped()
+        snapshot = game.snapshot()
+        game.restore(snapshot)
+        self.assertIs(game.reset.__self__, game)
+        before = snapshot.observe()
+        game.reset()
+        self.assertEqual(snapshot.observe(), before)
+
+    def test_fork_wrapped_maze_game(self):
+        game = curriculum.CurriculumWrappedGame(
+            games.MazeGame, games=[games.SingleGoal(), games.Goto()])
+        fork = game.fork()
+        # The fork shares the games not being played, so it isn't reset
+        self.assertIs(fork.reset.__self__, fork)
+        self.assertIs(fork.get_max_bounds.__self__, fork)
+        self.assertIsNot(fork.game, game.game)
+
+
+if __name__ == '__main__':
+    unittest.main()
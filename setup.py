@@ -10,7 +10,7 @@ here = path.abspath(path.dirname(__file__))
 with open(path.join(here, 'README.md'), encoding='utf-8') as f:
     long_description = f.read()
 
-requirements = ['six']
+requirements = ['six', 'numpy']
 
 setup(
     name='mazebase',